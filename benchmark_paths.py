@@ -0,0 +1,75 @@
+"""
+This file is responsible for comparing the pathfinding methods of
+GameState.optimal_path on random start and end tiles of a map
+"""
+import argparse
+import random
+import time
+import os
+from src.game_state import GameState
+from src.game_constants import Team, TileState, GameConstants
+from src.map import Map
+
+
+def reveal(map: Map, team: Team) -> None:
+    # Explore outwards from the visible tiles until the whole map is visible
+    changed = True
+    while changed:
+        changed = False
+        for row in range(map.get_height()):
+            for col in range(map.get_width()):
+                state = map.get_tile_state(row, col, team)
+                if state != TileState.ILLEGAL and state != TileState.IMPASSABLE:
+                    changed = len(map.explore(row, col, team)) > 0 or changed
+
+
+def main():
+    # Parser Arguements
+    parser = argparse.ArgumentParser(description='Benchmark Pathfinding')
+    parser.add_argument("-m", "--maps", nargs="+", default=[], help="map names")
+    parser.add_argument("-r", "--random", action="store_true", help=f"also benchmark a random {GameConstants.MAX_MAP_HEIGHT}x{GameConstants.MAX_MAP_WIDTH} map")
+    parser.add_argument("-n", "--queries", type=int, default=500, help="random start and end pairs per map")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="random seed")
+
+    # Define Input through CLI
+    currNamespace = parser.parse_args()
+
+    # Random maps are generated by Map itself, removed afterwards
+    maps = [(map_name, f"maps/{map_name}.awap23m") for map_name in currNamespace.maps]
+    if currNamespace.random:
+        maps.append(("random", "maps/_benchmark_random.awap23m"))
+    if not maps:
+        parser.error("specify maps with -m and/or -r")
+
+    for map_name, map_path in maps:
+        # Same random map and pairs whichever other maps are benchmarked
+        random.seed(currNamespace.seed)
+        try:
+            map = Map(map_path)
+        finally:
+            if map_name == "random" and os.path.exists(map_path):
+                os.remove(map_path)
+        reveal(map, Team.BLUE)
+        game_state = GameState({"team": Team.BLUE, "turn": 1}, {}, {}, None, map)
+
+        # Random pairs of passable tiles
+        tiles = [(row, col) for row in range(map.get_height()) for col in range(map.get_width())
+            if map.get_tile_state(row, col, Team.BLUE) != TileState.IMPASSABLE]
+        pairs = [(*random.choice(tiles), *random.choice(tiles)) for _ in range(currNamespace.queries)]
+
+        # Time each method, checking they agree on distances
+        times = {}
+        results = {}
+        for method in ("bfs", "astar"):
+            start = time.perf_counter()
+            results[method] = [game_state.optimal_path(*pair, method=method)[1] for pair in pairs]
+            times[method] = time.perf_counter() - start
+        if results["bfs"] != results["astar"]:
+            raise RuntimeError(f"Path distances differ on {map_name}")
+
+        perQuery = {method: 1e6 * times[method] / len(pairs) for method in times}
+        print(f"{map_name} {map.get_height()}x{map.get_width()}: bfs {perQuery['bfs']:.0f}us, "
+            f"astar {perQuery['astar']:.0f}us per path, {times['bfs'] / times['astar']:.1f}x faster")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+This file is responsible for converting replays between the
+JSON (.awap23r) and binary (.awap23b) formats.
+"""
+import argparse
+from src.replay import json_to_binary, binary_to_json, BINARY_EXTENSION, CODECS
+
+
+def main():
+    # Parser Arguements
+    parser = argparse.ArgumentParser(description='Convert Replay')
+    parser.add_argument("replay", help="replay file to convert")
+    parser.add_argument("-o", "--output", help="output file, defaults to the replay with the other extension")
+    parser.add_argument("-c", "--codec", choices=list(CODECS), default="lzma", help="compression for binary replays")
+
+    # Define Input through CLI
+    currNamespace = parser.parse_args()
+    replay = currNamespace.replay
+    stem = replay.rsplit(".", 1)[0]
+
+    # Convert based on extension
+    if replay.endswith(f".{BINARY_EXTENSION}"):
+        output = currNamespace.output or f"{stem}.awap23r"
+        binary_to_json(replay, output)
+    else:
+        output = currNamespace.output or f"{stem}.{BINARY_EXTENSION}"
+        json_to_binary(replay, output, currNamespace.codec)
+    print(output)
+
+if __name__ == "__main__":
+    main()
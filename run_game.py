@@ -20,6 +20,14 @@ def main():
     parser.add_argument('-sb', '--silence_blue', action='store_true', help="silence blue bot verbose")
     parser.add_argument('-sr', '--silence_red', action='store_true', help="silence red bot verbose")
     parser.add_argument('-f', '--file_input', help="read game settings (map, blueBot, redBot) from specified file")
+    parser.add_argument('-d', '--debug', action='store_true', help="check engine bookkeeping against full recounts every turn")
+    parser.add_argument('-ib', '--isolate_bots', action='store_true', help="run each bot in its own process, killed if it runs out of time")
+    parser.add_argument('-c', '--clock', choices=['wall', 'cpu'], default='wall', help="charge bots wall-clock time or their own cpu time")
+    parser.add_argument('-st', '--stream_replay', action='store_true', help="append each turn to the replay file as it is played")
+    parser.add_argument('-br', '--binary_replay', action='store_true', help="save the replay in the compact binary format")
+    parser.add_argument('-ra', '--record_actions', action='store_true', help="save every state-changing GameState call to an action log")
+    parser.add_argument('-hl', '--headless', action='store_true', help="no replay and no output redirection, only print the result")
+    parser.add_argument('-a', '--action_log', help="re-simulate the game recorded in an action log, without the bots")
     parser.add_argument('-vm', '--validate_map', action='store_true', help="runs map validator only")
 
     # Define Input through CLI
@@ -29,6 +37,13 @@ def main():
         val_maps()
         return
 
+    if currNamespace.action_log is not None:
+        # re-simulate a recorded game
+        curr = Game.from_action_log(currNamespace.action_log, print_reply=currNamespace.replay_print,
+            debug=currNamespace.debug, stream_replay=currNamespace.stream_replay, binary_replay=currNamespace.binary_replay)
+        replay = curr.run_game()
+        if currNamespace.replay_print: print(replay)
+        return
     
     if currNamespace.file_input is not None:
         # read map, blueBot,redBot from file
@@ -63,15 +78,23 @@ def main():
     print_reply = currNamespace.replay_print
     silence_blue = currNamespace.silence_blue
     silence_red = currNamespace.silence_red
+    debug = currNamespace.debug
+    isolate_bots = currNamespace.isolate_bots
+    clock = currNamespace.clock
+    stream_replay = currNamespace.stream_replay
+    binary_replay = currNamespace.binary_replay
+    record_actions = currNamespace.record_actions
+    headless = currNamespace.headless
 
     # Define game name for replay
     gameName = f"{currNamespace.blue_bot}-{currNamespace.red_bot}-{currNamespace.map}"
 
     # Get Game
     curr = Game(gameName, redBotFile, blueBotFile, mapFile, 
-    print_reply=print_reply, silence_blue=silence_blue, silence_red=silence_red)
+    print_reply=print_reply, silence_blue=silence_blue, silence_red=silence_red, debug=debug, isolate_bots=isolate_bots, clock=clock, stream_replay=stream_replay, binary_replay=binary_replay, record_actions=record_actions, headless=headless)
     replay = curr.run_game()
     if print_reply: print(replay)
+    if headless: print(replay)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,52 @@
+"""
+This file is responsible for reading in the tournament settings
+and running every match on a pool of worker processes.
+"""
+import argparse
+from src.tournament import Tournament
+from os import path
+from src.errors import *
+
+
+def main():
+    # Parser Arguements
+    parser = argparse.ArgumentParser(description='Run Tournament')
+    parser.add_argument("-b", "--bots", nargs="+", required=True, help="bot names")
+    parser.add_argument("-m", "--maps", nargs="+", required=True, help="map names")
+    parser.add_argument("-t", "--format", choices=["round_robin", "swiss"], default="round_robin", help="tournament format")
+    parser.add_argument("-n", "--rounds", type=int, help="number of swiss rounds, defaults to log2 of the number of bots")
+    parser.add_argument("-j", "--processes", type=int, help="number of worker processes, defaults to the number of cores")
+    parser.add_argument("-o", "--output", default="tournament_results.jsonl", help="aggregate results file")
+    parser.add_argument("-sr", "--save_replays", action="store_true", help="write a replay file for every game")
+    parser.add_argument("-ib", "--isolate_bots", action=argparse.BooleanOptionalAction, default=True,
+        help="run each bot in its own process, killed if it runs out of time (default), or as a thread with --no-isolate_bots")
+    parser.add_argument("-c", "--clock", choices=["wall", "cpu"], default="wall", help="charge bots wall-clock time or their own cpu time")
+
+    # Define Input through CLI
+    currNamespace = parser.parse_args()
+
+    # Check Bot Files
+    for bot in currNamespace.bots:
+        if (not path.exists(f"bots/{bot}.py")):
+            raise InvalidBotFileError(f"Bot file not found: {bot}")
+
+    # Check Map Files
+    for map_name in currNamespace.maps:
+        if (not path.exists(f"maps/{map_name}.awap23m")):
+            raise InvalidMapError(f"Map file not found: {map_name}")
+
+    # Run Tournament
+    tournament = Tournament(currNamespace.bots, currNamespace.maps, currNamespace.output,
+        processes=currNamespace.processes, save_replays=currNamespace.save_replays,
+        isolate_bots=currNamespace.isolate_bots, clock=currNamespace.clock)
+    if currNamespace.format == "swiss":
+        scores = tournament.run_swiss(currNamespace.rounds)
+    else:
+        scores = tournament.run_round_robin()
+
+    # Print Standings
+    for bot, score in sorted(scores.items(), key=lambda item: -item[1]):
+        print(f"{bot}: {score}")
+
+if __name__ == "__main__":
+    main()
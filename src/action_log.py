@@ -0,0 +1,94 @@
+"""
+This file is responsible for recording every state-changing GameState call
+of a game, and for playing them back without the original bots
+"""
+from src.game_constants import Direction, RobotType, Team
+import json
+import pathlib
+
+# Argument types of each recorded GameState method
+ACTION_ARGS = {
+    "spawn_robot": (RobotType, int, int),
+    "move_robot": (str, Direction),
+    "robot_action": (str,),
+    "transform_robot": (str, RobotType),
+}
+ACTION_LOG_EXTENSION = "awap23a"
+
+
+class ActionLog:
+    def __init__(self, game_name: str, map_path: str, red_path: str, blue_path: str, turns: list = None):
+        self.game_name = game_name
+        self.map_path = map_path
+        self.red_path = red_path
+        self.blue_path = blue_path
+        self.turns = turns if turns is not None else []
+        self.actions = []
+
+    def start_turn(self) -> None:
+        self.actions = []
+
+    def record(self, method: str, *args) -> None:
+        # Enums are stored by name
+        self.actions.append([method] + [arg.name if isinstance(arg, (Direction, RobotType)) else arg for arg in args])
+
+    def mark(self) -> int:
+        return len(self.actions)
+
+    def discard_since(self, mark: int) -> None:
+        # Drops calls recorded after mark, such as rolled back speculation
+        del self.actions[mark:]
+
+    def end_turn(self, team: Team, wall_time: float, cpu_time: float, finished: bool) -> None:
+        # Times are kept so a re-simulation charges bots exactly the same
+        self.turns.append({
+            "team": team.name,
+            "actions": self.actions,
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "finished": finished,
+        })
+
+    def write(self) -> str:
+        # create replay folder if needed
+        path = pathlib.Path("replays/")
+        path.mkdir(parents=True, exist_ok=True)
+
+        # write the actual file
+        fileName = f"replays/{self.game_name}.{ACTION_LOG_EXTENSION}"
+        with open(fileName, "w") as outfile:
+            outfile.write(json.dumps({
+                "game_name": self.game_name,
+                "map_path": self.map_path,
+                "red_path": self.red_path,
+                "blue_path": self.blue_path,
+                "turns": self.turns,
+            }, separators=(',', ':')))
+        return fileName
+
+    @staticmethod
+    def read(path: str) -> "ActionLog":
+        with open(path) as infile:
+            data = json.load(infile)
+        return ActionLog(data["game_name"], data["map_path"], data["red_path"], data["blue_path"], data["turns"])
+
+
+class ActionLogPlayer:
+    """
+    Stands in for a bot, replaying its recorded GameState calls
+    """
+
+    def __init__(self, team: Team, action_log: ActionLog):
+        self.team = team
+        self._turns = iter([turn for turn in action_log.turns if turn["team"] == team.name])
+        self.turn = None
+
+    def next_turn(self) -> dict:
+        self.turn = next(self._turns)
+        return self.turn
+
+    def play_turn(self, game_state) -> None:
+        for method, *args in self.turn["actions"]:
+            types = ACTION_ARGS[method]
+            args = [typ[arg] if typ in (Direction, RobotType) else arg for typ, arg in zip(types, args)]
+            getattr(game_state, method)(*args)
@@ -0,0 +1,210 @@
+"""
+This file is responsible for stepping many games at once for self-play
+training. Games are played in lockstep, one team's turn per step, with
+no bot threads, no stdout redirection and no replay
+"""
+from src.game_constants import Team, Direction, RobotType, GameConstants
+from src.game_state import GameState, begin_turn, decide_winner
+from src.observation import np, OBSERVATION_PLANES
+from src.map import Map
+
+# Per-tile action codes, applied to the robot on (or spawned onto) the tile
+DIRECTIONS = tuple(Direction)
+ROBOT_TYPES = (RobotType.EXPLORER, RobotType.MINER, RobotType.TERRAFORMER)
+ACTION_NONE = 0
+ACTION_MOVE = 1                                 # + index in DIRECTIONS
+ACTION_ACT = ACTION_MOVE + len(DIRECTIONS)      # robot action without moving
+ACTION_MOVE_ACT = ACTION_ACT + 1                # + index in DIRECTIONS, move then act
+ACTION_TRANSFORM = ACTION_MOVE_ACT + len(DIRECTIONS)  # + index in ROBOT_TYPES
+ACTION_SPAWN = ACTION_TRANSFORM + len(ROBOT_TYPES)    # + index in ROBOT_TYPES, onto an empty tile
+NUM_ACTIONS = ACTION_SPAWN + len(ROBOT_TYPES)
+
+# Reward columns
+TEAMS = (Team.BLUE, Team.RED)
+
+
+def check_actions(actions) -> None:
+    # Codes outside the table would index past it, or wrap around for negative codes
+    if actions.size and (actions.min() < 0 or actions.max() >= NUM_ACTIONS):
+        bad = actions[(actions < 0) | (actions >= NUM_ACTIONS)]
+        raise ValueError(f"Action codes must be in [0, {NUM_ACTIONS}), got {bad[0]}")
+
+
+class BatchGame:
+    """
+    Engine state of one game, driven directly through its GameState
+    """
+
+    def __init__(self, map_path: str):
+        self.map = Map(map_path, radius=GameConstants.BASE_VISIBLE_RADIUS, cache=True)
+        self.info = {
+            "team": Team.BLUE,
+            "red_metal": GameConstants.INIT_METAL,
+            "blue_metal": GameConstants.INIT_METAL,
+            "red_time": GameConstants.TIME_LIMIT,
+            "blue_time": GameConstants.TIME_LIMIT,
+            "turn": 1,
+        }
+        self.red_robots = {}
+        self.blue_robots = {}
+        self.game_state = GameState(self.info, self.red_robots, self.blue_robots, None, self.map)
+
+    def begin_turn(self, team: Team, turn: int) -> None:
+        self.info.update({"team": team, "turn": turn})
+        robots = self.red_robots if team == Team.RED else self.blue_robots
+        begin_turn(self.info, robots, self.map)
+        self.game_state.start_turn()
+
+    def apply_actions(self, actions) -> None:
+        """
+        Applies one turn of flat per-tile action codes for the current team.
+        Transforms, moves and robot actions go to the robots on their tiles at
+        the start of the turn (in row-major order), then spawns. Illegal
+        actions are skipped, and codes outside [0, NUM_ACTIONS) or not one per
+        tile raise a ValueError before any action is applied
+        """
+        actions = np.asarray(actions)
+        tiles = self.map.get_height() * self.map.get_width()
+        if actions.shape != (tiles,):
+            raise ValueError(f"Expected {tiles} action codes, got shape {actions.shape}")
+        check_actions(actions)
+        game_state = self.game_state
+        team = self.info.get("team")
+        occupancy = self.map.get_occupancy()
+
+        # Robots each code applies to, fixed before anything moves
+        orders = []
+        spawns = []
+        for index in np.flatnonzero(actions).tolist():
+            code = int(actions[index])
+            robot = occupancy.get(index)
+            if code >= ACTION_SPAWN:
+                if robot is None:
+                    spawns.append((index, ROBOT_TYPES[code - ACTION_SPAWN]))
+            elif robot is None or robot.get_team() != team:
+                continue
+            elif code >= ACTION_TRANSFORM:
+                orders.append((robot.get_name(), None, False, ROBOT_TYPES[code - ACTION_TRANSFORM]))
+            elif code < ACTION_ACT:
+                orders.append((robot.get_name(), DIRECTIONS[code - ACTION_MOVE], False))
+            elif code == ACTION_ACT:
+                orders.append((robot.get_name(), None, True))
+            else:
+                orders.append((robot.get_name(), DIRECTIONS[code - ACTION_MOVE_ACT], True))
+        game_state.submit_actions(orders)
+
+        width = self.map.get_width()
+        for index, robotType in spawns:
+            row, col = divmod(index, width)
+            if game_state.can_spawn_robot(robotType, row, col):
+                game_state.spawn_robot(robotType, row, col)
+
+    def winner(self) -> Team:
+        # Same order as a game played to the last turn, no time is charged
+        return decide_winner(
+            self.map.get_terraformed_count(Team.RED), self.map.get_terraformed_count(Team.BLUE),
+            len(self.red_robots), len(self.blue_robots),
+            self.info.get("red_metal"), self.info.get("blue_metal"),
+            self.info.get("red_time"), self.info.get("blue_time"))
+
+
+class BatchEnv:
+    def __init__(self, map_paths, num_envs: int = None, max_turns: int = GameConstants.NUM_TURNS):
+        """
+        Initializes a batch of games, in the style of a gym vector environment.
+        Every step plays one team's turn (blue first) in all games, and games
+        are reset together once red has played the last turn
+
+        Args:
+            map_paths (str | list[str]): map file(s), assigned to games in turn; all must have the same size
+            num_envs (int): number of games, defaults to one per map
+            max_turns (int): turns per team
+        """
+        if np is None:
+            raise ImportError("BatchEnv requires numpy, install it with: pip install numpy")
+        if isinstance(map_paths, str):
+            map_paths = [map_paths]
+        if num_envs is None:
+            num_envs = len(map_paths)
+        if num_envs < 1:
+            raise ValueError("BatchEnv needs at least one game")
+
+        self.map_paths = [map_paths[i % len(map_paths)] for i in range(num_envs)]
+        self.num_envs = num_envs
+        self.max_turns = max_turns
+        self.games = []
+        self.team = Team.BLUE
+        self.turn = 1
+
+    @property
+    def observation_shape(self) -> tuple:
+        game = self.games[0] if self.games else BatchGame(self.map_paths[0])
+        return (len(OBSERVATION_PLANES), game.map.get_height(), game.map.get_width())
+
+    def reset(self):
+        """
+        Starts new games, returning blue's first observations, shaped
+        (num_envs, *observation_shape)
+        """
+        self.games = [BatchGame(path) for path in self.map_paths]
+        shapes = {(game.map.get_height(), game.map.get_width()) for game in self.games}
+        if len(shapes) > 1:
+            raise ValueError(f"All maps of a BatchEnv must have the same size, got {sorted(shapes)}")
+        self.team = Team.BLUE
+        self.turn = 1
+        for game in self.games:
+            game.begin_turn(self.team, self.turn)
+        return self.observe()
+
+    def observe(self):
+        # Observations of the team about to play
+        return np.stack([game.game_state.get_observation() for game in self.games])
+
+    def step(self, actions):
+        """
+        Plays the current team's turn in every game
+
+        Args:
+            actions: integer action codes shaped (num_envs, height, width) or
+                (num_envs, height * width), see NUM_ACTIONS. Any other shape, or a code
+                outside [0, NUM_ACTIONS), raises a ValueError and no game is stepped
+
+        Returns:
+            observations for the next team to play (the first observations of new
+            games once done), rewards shaped (num_envs, 2) with columns in TEAMS
+            order (+1 win, -1 loss on the last step, 0 otherwise), done flags
+            shaped (num_envs,) and a list of per-game info dicts
+        """
+        if not self.games:
+            raise RuntimeError("BatchEnv.step called before reset")
+        actions = np.asarray(actions)
+        _, height, width = self.observation_shape
+        if actions.shape not in ((self.num_envs, height, width), (self.num_envs, height * width)):
+            raise ValueError(f"Expected actions shaped ({self.num_envs}, {height}, {width}) or "
+                f"({self.num_envs}, {height * width}), got {actions.shape}")
+        actions = actions.reshape(self.num_envs, -1)
+        check_actions(actions)
+
+        for game, gameActions in zip(self.games, actions):
+            game.apply_actions(gameActions)
+
+        rewards = np.zeros((self.num_envs, len(TEAMS)), dtype=np.float32)
+        infos = [{} for _ in self.games]
+
+        # Red played the last turn, score and start over
+        if self.team == Team.RED and self.turn == self.max_turns:
+            for i, game in enumerate(self.games):
+                winner = game.winner()
+                rewards[i] = [1 if team == winner else -1 for team in TEAMS]
+                infos[i]["winner"] = winner
+            return self.reset(), rewards, np.ones(self.num_envs, dtype=bool), infos
+
+        # Next team's turn
+        if self.team == Team.BLUE:
+            self.team = Team.RED
+        else:
+            self.team = Team.BLUE
+            self.turn += 1
+        for game in self.games:
+            game.begin_turn(self.team, self.turn)
+        return self.observe(), rewards, np.zeros(self.num_envs, dtype=bool), infos
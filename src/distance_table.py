@@ -0,0 +1,136 @@
+"""
+This file is responsible for the true shortest distances between tiles,
+ignoring fog and robots. Impassable tiles never change, so the distances
+of a map are computed once, shared within the process and cached on disk
+"""
+from array import array
+from collections import deque
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+DISTANCE_CACHE_DIR = "maps/distances"
+DISTANCE_EXTENSION = "awap23d"
+DISTANCE_MAGIC = b"AWD1"
+HEADER_STRUCT = struct.Struct("<4sHHc")   # magic, height, width, typecode
+
+# Stored for tiles that cannot be reached, by array typecode
+UNREACHABLE = {"B": 0xFF, "H": 0xFFFF}
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class DistanceTable:
+    """
+    Distances from each tile to every other, one row per start index.
+    Rows are searched the first time they are needed; once every row is
+    known the table is narrowed to uint8 if it fits and written to disk
+    """
+
+    def __init__(self, height: int, width: int, impassable: list[bool], neighbors: list, key: str = None):
+        self.height = height
+        self.width = width
+        self.key = key
+        self._impassable = impassable
+        self._neighbors = neighbors
+        self._rows = [None] * (height * width)
+        self._missing = height * width
+        if key is not None:
+            self.read_cache()
+
+    @property
+    def cache_path(self) -> str:
+        return f"{DISTANCE_CACHE_DIR}/{self.key}.{DISTANCE_EXTENSION}"
+
+    def is_complete(self) -> bool:
+        return self._missing == 0
+
+    def distances_from(self, index: int) -> array:
+        """
+        Distances from index to every tile, UNREACHABLE[row.typecode] where
+        there is no path
+        """
+        row = self._rows[index]
+        if row is None:
+            row = self._rows[index] = self.search(index)
+            self._missing -= 1
+            if self._missing == 0:
+                self.narrow()
+                if self.key is not None:
+                    self.write_cache()
+        return row
+
+    def distance(self, start: int, end: int) -> int:
+        # Moves are reversible, so either row answers
+        row = self._rows[end]
+        if row is not None:
+            value = row[start]
+        else:
+            row = self.distances_from(start)
+            value = row[end]
+        return -1 if value == UNREACHABLE[row.typecode] else value
+
+    def compute_all(self) -> None:
+        for index in range(len(self._rows)):
+            self.distances_from(index)
+
+    def search(self, start: int) -> array:
+        # BFS through every passable tile
+        impassable, neighbors = self._impassable, self._neighbors
+        distances = array("H", [UNREACHABLE["H"]]) * len(self._rows)
+        if impassable[start]:
+            return distances
+        distances[start] = 0
+        queue = deque([start])
+        while (queue):
+            index = queue.popleft()
+            moves = distances[index] + 1
+            for _, newIndex in neighbors[index]:
+                if (distances[newIndex] == UNREACHABLE["H"] and not impassable[newIndex]):
+                    distances[newIndex] = moves
+                    queue.append(newIndex)
+        return distances
+
+    def narrow(self) -> None:
+        # uint8 when every reachable distance fits under its marker
+        longest = max(max(set(row) - {UNREACHABLE["H"]}, default=0) for row in self._rows)
+        if longest >= UNREACHABLE["B"]:
+            return
+        # The low byte of each value, which turns 0xFFFF into 0xFF
+        low = 0 if sys.byteorder == "little" else 1
+        self._rows = [array("B", row.tobytes()[low::2]) for row in self._rows]
+
+    def read_cache(self) -> bool:
+        try:
+            with open(self.cache_path, "rb") as infile:
+                data = zlib.decompress(infile.read())
+        except (OSError, zlib.error):
+            return False
+        if len(data) < HEADER_STRUCT.size:
+            return False
+        magic, height, width, typecode = HEADER_STRUCT.unpack_from(data)
+        if magic != DISTANCE_MAGIC or (height, width) != (self.height, self.width) or typecode not in (b"B", b"H"):
+            return False
+        table = array(typecode.decode())
+        table.frombytes(data[HEADER_STRUCT.size:])
+        size = height * width
+        if len(table) != size * size:
+            return False
+        self._rows = [table[index * size:(index + 1) * size] for index in range(size)]
+        self._missing = 0
+        return True
+
+    def write_cache(self) -> None:
+        typecode = self._rows[0].typecode
+        header = HEADER_STRUCT.pack(DISTANCE_MAGIC, self.height, self.width, typecode.encode())
+        try:
+            os.makedirs(DISTANCE_CACHE_DIR, exist_ok=True)
+            with open(self.cache_path, "wb") as outfile:
+                outfile.write(zlib.compress(header + b"".join(row.tobytes() for row in self._rows)))
+        except OSError:
+            # Read-only map folders just don't get a cache
+            pass
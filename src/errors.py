@@ -54,4 +54,10 @@ class InvalidMapError(UserError):
     pass
 
 class UnknownRobotError(UserError):
-    pass
\ No newline at end of file
+    pass
+
+class SpeculationError(UserError):
+    pass
+
+class ForkError(UserError):
+    pass
@@ -3,16 +3,19 @@ This file is responsible to the execution of a game
 """
 from src.player import Player
 from src.game_constants import Team
-from src.game_state import GameState
+from src.game_state import GameState, begin_turn, decide_winner
 from src.replay import Replay
 from src.robot import Robot
 from src.map import Map
 from src.game_constants import GameConstants
+from src.timeout import ProcessPlayer
+from src.action_log import ActionLog, ActionLogPlayer
 import importlib.util
 import sys
 from contextlib import contextmanager
 import os
 from threading import Thread
+from typing import NamedTuple
 import time
 
 # Global Functions
@@ -26,34 +29,80 @@ def suppress_stdout():
         finally:
             sys.stdout = old_stdout
 
-def import_file(module_name, file_path):
+class GameResult(NamedTuple):
+    """
+    Final result of a headless game
+    """
+    winner: Team
+    red_terra_tiles: int
+    blue_terra_tiles: int
+    red_robots: int
+    blue_robots: int
+    timeout: bool
+
+# Bot modules, reused across games when reuse=True
+_module_cache = {}
+
+def import_file(module_name, file_path, reuse=False):
+    if reuse and file_path in _module_cache:
+        return _module_cache[file_path]
     spec = importlib.util.spec_from_file_location(module_name, file_path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
     sys.modules[module_name] = module
+    if reuse: _module_cache[file_path] = module
     return module
 
 class Game:
-    def __init__(self, game_name, red_path, blue_path, map_path, print_reply=False, silence_blue=True, silence_red=True):
+    def __init__(self, game_name, red_path, blue_path, map_path, print_reply=False, silence_blue=True, silence_red=True, debug=False, reuse_setup=False, isolate_bots=False, clock="wall", stream_replay=False, binary_replay=False, record_actions=False, action_log=None, headless=False, replay_name=None):
         """
         Initializes players
 
         Args:
             p1_path (_type_): path to player 1's file
             p2_path (_type_): path to player 2's file
+            debug (bool): check incremental engine bookkeeping against full recounts
+            reuse_setup (bool): reuse parsed maps and imported bots from earlier games in this process
+            isolate_bots (bool): run each bot in its own worker process, killed if it runs out of time
+            clock (str): "wall" charges bots wall-clock time, "cpu" charges bots their own cpu time
+            stream_replay (bool): append each turn to the replay file as it is played
+            binary_replay (bool): save the replay in the compact binary format
+            record_actions (bool): save every state-changing GameState call to an action log
+            action_log (ActionLog): re-simulate a recorded game instead of running the bots
+            headless (bool): no replay and no output redirection, run_game only returns a GameResult
+            replay_name (str): file name of the replay in replays/, defaults to the game name
         """
 
         # initialize map
-        self.map = Map(map_path, radius=GameConstants.BASE_VISIBLE_RADIUS)
+        self.map = Map(map_path, radius=GameConstants.BASE_VISIBLE_RADIUS, cache=reuse_setup)
+
+        # Robot names restart for each game
+        Robot.counter = 1
 
         # General Game Variables
         self.winner = None
         self.max_turns = GameConstants.NUM_TURNS
+        self.wall_budget = GameConstants.CPU_CLOCK_WALL_BUDGET
         self.robot_charge = GameConstants.ROBOT_CHARGE
         self.passive_metal = GameConstants.METAL_GAINED_PER_TURN
         self.silence_blue = silence_blue
         self.silence_red = silence_red
         self.print_reply = print_reply
+        self.debug = debug
+        self.isolate_bots = isolate_bots
+        if clock not in ("wall", "cpu"):
+            raise ValueError(f"Unknown clock {clock}, expected wall or cpu")
+        self.clock = clock
+        if stream_replay and binary_replay:
+            raise ValueError("Streaming replays cannot be saved in the binary format")
+        if print_reply and binary_replay:
+            raise ValueError("Printed replays cannot be saved in the binary format")
+        self.binary_replay = binary_replay
+        if headless and (stream_replay or binary_replay or print_reply):
+            raise ValueError("Headless games do not write replays")
+        self.headless = headless
+        self.action_log = ActionLog(game_name, map_path, red_path, blue_path) if record_actions else None
+        self.resimulated_log = action_log
 
         # Robot Names
         map_name = map_path.split('/')[1].split(".")[0]
@@ -61,7 +110,7 @@ class Game:
         blue_robot_name = blue_path.split('/')[1].split(".")[0]
 
         # replay info
-        self.replay = Replay(
+        self.replay = None if headless else Replay(
             game_name,
             map_name,
             self.map.get_height(),
@@ -72,9 +121,15 @@ class Game:
             self.map.initial_map_passability,
             self.map.initial_map_metal,
             self.map.initial_map_terraformed,
-            self.map.initial_map_visible
+            self.map.initial_map_visible,
+            stream=stream_replay,
+            file_name=replay_name
         )
 
+        # Silenced bots print here, opened once per game
+        silenced = (silence_blue or silence_red) and not (headless or isolate_bots or action_log is not None)
+        self.devnull = open(os.devnull, "w") if silenced else None
+
         # initialize game state variables
         self.info = {}
         self.info.update({"team":Team.BLUE})
@@ -85,49 +140,77 @@ class Game:
         self.info.update({"turn":1})
         self.red_robots = {}
         self.blue_robots = {}
-        self.game_state = GameState(self.info, self.red_robots, self.blue_robots, self.replay, self.map)
+
+        # Wall-clock time each bot has used, capped by wall_budget on the cpu clock
+        self.wall_used = {Team.RED: 0, Team.BLUE: 0}
+        self.game_state = GameState(self.info, self.red_robots, self.blue_robots, self.replay, self.map, self.action_log)
         
         # initialize players
-        self.blue_player: Player = import_file(
-            f"bots.{blue_robot_name}", blue_path).BotPlayer(Team.BLUE)
-        self.red_player: Player = import_file(
-            f"bots.{red_robot_name}", red_path).BotPlayer(Team.RED)
+        if action_log is not None:
+            self.blue_player = ActionLogPlayer(Team.BLUE, action_log)
+            self.red_player = ActionLogPlayer(Team.RED, action_log)
+        elif isolate_bots:
+            self.blue_player = ProcessPlayer(Team.BLUE, f"bots.{blue_robot_name}", blue_path, silence_blue)
+            self.red_player = ProcessPlayer(Team.RED, f"bots.{red_robot_name}", red_path, silence_red)
+        else:
+            self.blue_player: Player = import_file(
+                f"bots.{blue_robot_name}", blue_path, reuse=reuse_setup).BotPlayer(Team.BLUE)
+            self.red_player: Player = import_file(
+                f"bots.{red_robot_name}", red_path, reuse=reuse_setup).BotPlayer(Team.RED)
+
+    @classmethod
+    def from_action_log(cls, path: str, **kwargs):
+        """
+        Sets up a bot-free re-simulation of a recorded game. Its replay is
+        saved as <game>-resim, next to the recorded game's rather than over it
+        """
+        action_log = ActionLog.read(path)
+        kwargs.setdefault("replay_name", f"{action_log.game_name}-resim")
+        return cls(action_log.game_name, action_log.red_path, action_log.blue_path, action_log.map_path,
+            action_log=action_log, **kwargs)
 
     def get_curr_team(self) -> Team:
         return self.info.get("team")
 
-    def run_game(self) -> Replay:
+    def run_game(self):
         """
-        Runs an entire game, using the specified object
+        Runs an entire game, using the specified object.
+        Returns the replay, or a GameResult when headless
         """
+        try:
+            replay = self.play_game()
+            if self.action_log is not None:
+                self.action_log.write()
+            return replay
+        finally:
+            # Close a streaming replay left open by a crash
+            if self.replay is not None:
+                self.replay.close()
+            if self.devnull is not None:
+                self.devnull.close()
+
+            # Shut down bot worker processes
+            if self.isolate_bots:
+                self.blue_player.close()
+                self.red_player.close()
+
+    def play_game(self) -> Replay:
         # Play all turns
         for turn in range(1, self.max_turns+1):
             # Play Blue Team's Turn
             self.info.update({"team":Team.BLUE})
             timeout = self.run_turn(turn, self.blue_player)
             if timeout: # Declare Red Winner on Timeout
-                self.replay.setWinner("red")
-                if not (self.silence_blue and self.silence_red): 
-                    print(f"Winner: {self.replay.metadata.winner} By Timeout")
-                return self.replay.write_json(self.print_reply)
+                return self.end_game(Team.RED, timeout=True)
             # Play Red Team's Turn
             self.info.update({"team":Team.RED})
             timeout = self.run_turn(turn, self.red_player)
             if timeout: # Declare Blue Winner on Timeout
-                self.replay.setWinner("blue")
-                if not (self.silence_blue and self.silence_red): 
-                    print(f"Winner: {self.replay.metadata.winner} By Timeout")
-                return self.replay.write_json(self.print_reply)
+                return self.end_game(Team.BLUE, timeout=True)
 
         # Calculate Terra Tiles
-        red_terra_tiles = 0
-        blue_terra_tiles = 0
-        for row in range(self.map.get_height()):
-            for col in range(self.map.get_width()):
-                if (self.map.is_terraformed(Team.BLUE, row, col)):
-                    blue_terra_tiles += 1
-                elif (self.map.is_terraformed(Team.RED, row, col)):
-                    red_terra_tiles += 1
+        red_terra_tiles = self.get_tile_count(Team.RED)
+        blue_terra_tiles = self.get_tile_count(Team.BLUE)
 
         # Calculate Number of Robots
         red_robots = len(self.red_robots.keys())
@@ -142,31 +225,31 @@ class Game:
         blue_time = self.info.get('blue_time')
 
         # Check
-        if (red_terra_tiles > blue_terra_tiles):
-            self.replay.setWinner("red")
-        elif (blue_terra_tiles > red_terra_tiles):
-            self.replay.setWinner("blue")
-        elif (red_robots > blue_robots):
-            self.replay.setWinner("red")
-        elif (blue_robots > red_robots):
-            self.replay.setWinner("blue")
-        elif (red_metal > blue_metal):
-            self.replay.setWinner("red")
-        elif (blue_metal > red_metal):
-            self.replay.setWinner("blue")
-        elif (red_time < blue_time):
-            self.replay.setWinner("red")
-        elif (blue_time < red_time):
-            self.replay.setWinner("blue")
-        else:
-            # red wins by default
-            self.replay.setWinner("red")
+        winner = decide_winner(red_terra_tiles, blue_terra_tiles, red_robots, blue_robots,
+            red_metal, blue_metal, red_time, blue_time)
+        return self.end_game(winner)
+
+    def end_game(self, winner: Team, timeout: bool = False):
+        self.winner = winner
+
+        # Headless games only report the result
+        if self.headless:
+            return GameResult(winner, self.get_tile_count(Team.RED), self.get_tile_count(Team.BLUE),
+                len(self.red_robots), len(self.blue_robots), timeout)
 
         # Save Replay File
+        self.replay.setWinner(winner.name.lower())
         if not (self.silence_blue and self.silence_red):
-            print(f"Winner: {self.replay.metadata.winner}")
-        retJson = self.replay.write_json(self.print_reply)
-        return retJson
+            if timeout:
+                print(f"Winner: {self.replay.metadata.winner} By Timeout")
+            else:
+                print(f"Winner: {self.replay.metadata.winner}")
+        return self.save_replay()
+
+    def save_replay(self):
+        if self.binary_replay:
+            return self.replay.write_binary()
+        return self.replay.write_json(self.print_reply)
 
     def run_turn(self, turn: int, player: Player) -> bool:
         """
@@ -190,51 +273,77 @@ class Game:
             player = self.blue_player
             time_left = self.info.get('blue_time')
 
-        # start gaining passive metal after round one
-        if turn > 1:
-            if team == Team.RED:
-                self.info.update({'red_metal':self.info.get('red_metal') + self.passive_metal})
-            else:
-                self.info.update({'blue_metal':self.info.get('blue_metal') + self.passive_metal})
-
-        # Update Robots Battery on Terraform Tiles
-        for robot_name in robots.keys():
-            currRobot : Robot = robots.get(robot_name)
-            currRobot.reset_acted_status()
-            currRobot.reset_move_status()
-            row, col = currRobot.get_coord()
-            if (self.map.is_terraformed(team, row, col)):
-                if currRobot.charge(self.robot_charge):
-                    self.replay.add_robot_changes(currRobot, False)
-
-
-        # Suppress Print
-        if(team == Team.BLUE and self.silence_blue):
-            stdout = sys.stdout
-            sys.stdout = open(os.devnull, "w")
-        if(team == Team.RED and self.silence_red):
-            stdout = sys.stdout
-            sys.stdout = open(os.devnull, "w")
-        
-        # Run Thread
-        thread = Thread(target=player.play_turn, args=[self.game_state], daemon=True)
-        funcTime = time.time()
-        thread.start()      
-        thread.join(time_left)
-        funcTime = time.time() - funcTime
+        # On the cpu clock, sleeping bots are still held to a wall-clock budget
+        wall_limit = min(time_left * GameConstants.CPU_CLOCK_WALL_FACTOR, self.wall_budget - self.wall_used[team])
+
+        # Passive metal, then reset and charge robots
+        begin_turn(self.info, robots, self.map, self.replay, self.passive_metal, self.robot_charge)
+        self.game_state.start_turn()
 
-        # Restore Print
-        if(team == Team.BLUE and self.silence_blue):
-            sys.stdout = stdout
-        if(team == Team.RED and self.silence_red):
-            sys.stdout = stdout
+        if self.action_log is not None:
+            self.action_log.start_turn()
 
+        # Re-simulate logged calls, charging the logged times
+        if self.resimulated_log is not None:
+            logged = player.next_turn()
+            player.play_turn(self.game_state)
+            wallTime, cpuTime, finished = logged["wall_time"], logged["cpu_time"], logged["finished"]
+
+        # Run Worker Process, silenced inside the worker
+        elif self.isolate_bots:
+            wallTime = time.time()
+            finished, cpuTime = player.play_turn(self.game_state, time_left, cpu_clock=(self.clock == "cpu"), wall_limit=wall_limit)
+            wallTime = time.time() - wallTime
+        else:
+            # Suppress Print
+            silenced = self.devnull is not None and (self.silence_red if team == Team.RED else self.silence_blue)
+            if silenced:
+                stdout = sys.stdout
+                sys.stdout = self.devnull
+
+            # Run Thread, recording its own cpu time
+            threadTime = {}
+            def play_turn():
+                start = time.thread_time()
+                try:
+                    player.play_turn(self.game_state)
+                finally:
+                    threadTime["cpu"] = time.thread_time() - start
+            thread = Thread(target=play_turn, daemon=True)
+            wallTime = time.time()
+            thread.start()
+            sampledTime = self.join_thread(thread, time_left, wall_limit)
+            wallTime = time.time() - wallTime
+            finished = not thread.is_alive()
+            cpuTime = threadTime.get("cpu", sampledTime)
+
+            # Restore Print
+            if silenced:
+                sys.stdout = stdout
+
+
+        # Speculation left open by the bot never happened
+        if finished:
+            while self.game_state.is_speculating():
+                self.game_state.rollback()
+
+        # Charge the bot on the selected clock, a missing cpu report costs the wall time
+        if self.clock == "cpu" and cpuTime is not None and cpuTime >= 0:
+            funcTime = cpuTime
+        else:
+            funcTime = wallTime
+        funcTime = max(funcTime, 0)
+        if self.action_log is not None:
+            self.action_log.end_turn(team, wallTime, cpuTime, finished)
+        self.wall_used[team] += wallTime
+        out_of_wall = self.clock == "cpu" and self.wall_used[team] >= self.wall_budget
 
         # If there is still time left, automatically lose on timeout
-        if thread.is_alive() or funcTime >= time_left:
+        if not finished or funcTime >= time_left or out_of_wall:
             if (team == Team.RED): replay_team = "red"
             else: replay_team = "blue"
-            self.replay.addTurn(replay_team, -1, -1, -1, turn, -1, timeout=True)
+            if self.replay is not None:
+                self.replay.addTurn(replay_team, -1, -1, -1, turn, -1, timeout=True, wall_time=wallTime, cpu_time=cpuTime)
             return True
 
         # Change Replay File
@@ -250,19 +359,53 @@ class Game:
             time_left = self.info.get('blue_time')
 
 
+        # Headless games keep no turn details
+        if self.replay is None:
+            return False
+
         # count terraformed tiles
         num_terr = self.get_tile_count(team)
 
         # Turn Details
-        self.replay.addTurn(replay_team, time_left, len(robots), num_terr, turn, metal)
+        self.replay.addTurn(replay_team, time_left, len(robots), num_terr, turn, metal, wall_time=wallTime, cpu_time=cpuTime)
         return False
 
+    def join_thread(self, thread: Thread, time_left: float, wall_limit: float) -> float:
+        """
+        Waits for a bot's thread until it finishes or runs out of time (with the
+        cpu clock, also once it has run for wall_limit seconds of wall time).
+        Returns the thread's last sampled cpu time, or -1 if it was not sampled
+        """
+        if self.clock == "wall":
+            thread.join(time_left)
+            return -1
+
+        # Sample the thread's cpu clock, with a wall-clock cap for sleeping bots
+        deadline = time.time() + wall_limit
+        try:
+            clock_id = time.pthread_getcpuclockid(thread.ident)
+        except (AttributeError, OSError):
+            # Not supported on this platform, or the thread already finished
+            clock_id = None
+        sampled = -1
+        while thread.is_alive():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            thread.join(min(remaining, GameConstants.CPU_CLOCK_POLL_INTERVAL))
+            if clock_id is not None and thread.is_alive():
+                try:
+                    sampled = time.clock_gettime(clock_id)
+                except OSError:
+                    continue
+                if sampled >= time_left:
+                    break
+        return sampled
+
 
     def get_tile_count(self, team):
-        count = 0
-        map = self.map
-        for row in range(map.get_height()):
-            for col in range(map.get_width()):
-                if self.map.is_terraformed(team, row, col):
-                    count += 1
-        return count
+        if self.debug:
+            self.map.check_terraformed_counts()
+            self.map.check_map_cache()
+            self.map.check_tile_indexes()
+        return self.map.get_terraformed_count(team)
@@ -46,6 +46,15 @@ class RobotType(Enum):
     EXPLORER = "Explorer"
 
 
+class PathTarget(Enum):
+    """
+    Describes the tiles a distance field leads to
+    """
+    ALLY_TERRAFORMED = 1    # ally terraformed tiles
+    MINES = 2               # visible mining tiles
+    FOG_FRONTIER = 3        # visible passable tiles next to fog
+
+
 class GameConstants:
     """
     This is an example from last year
@@ -60,6 +69,9 @@ class GameConstants:
 
     # TIME CONSTANTS
     TIME_LIMIT = 10 + 1 * NUM_TURNS # base time + time per turn
+    CPU_CLOCK_WALL_FACTOR = 4       # wall-clock cap on a turn (multiple of time left) when charging cpu time
+    CPU_CLOCK_WALL_BUDGET = 2 * TIME_LIMIT  # wall-clock time a bot may use over the whole game when charging cpu time
+    CPU_CLOCK_POLL_INTERVAL = 0.01  # how often a bot's cpu clock is sampled during its turn
 
     # Currency Constants
     INIT_BATTERY = 120
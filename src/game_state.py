@@ -1,11 +1,86 @@
 from dataclasses import dataclass
 from src.map import Map
 from src.robot import Robot, Miner_Robot, Explorer_Robot, Terraformer_Robot, RobotInfo
-from src.game_constants import Team, Direction, TileState, GameConstants, RobotType
+from src.game_constants import Team, Direction, TileState, GameConstants, RobotType, PathTarget
 from src.replay import Replay
+from src.action_log import ActionLog
+from src.observation import build_observation
 from src.info import *
 from src.errors import *
 from collections import deque
+import heapq
+
+def begin_turn(info: dict, robots: dict, map: Map, replay: Replay = None,
+               passive_metal: int = GameConstants.METAL_GAINED_PER_TURN,
+               robot_charge: int = GameConstants.ROBOT_CHARGE) -> None:
+    """
+    Start of a team's turn, before its bot plays: passive metal, then
+    resetting and charging the team's robots. Called by the engine, not bots
+    """
+    team = info.get("team")
+
+    # start gaining passive metal after round one
+    if info.get("turn") > 1:
+        if team == Team.RED:
+            info.update({'red_metal':info.get('red_metal') + passive_metal})
+        else:
+            info.update({'blue_metal':info.get('blue_metal') + passive_metal})
+
+    # Robots standing on ally terraformed tiles, as one bitboard
+    charging = map.get_robot_bits(team) & map.get_owned_bits(team)
+    width = map.get_width()
+
+    # Update Robots Battery on Terraform Tiles
+    for robot_name in robots.keys():
+        currRobot : Robot = unshare_robot(robots, map, robots.get(robot_name))
+        currRobot.reset_acted_status()
+        currRobot.reset_move_status()
+        map.mark_robot_dirty(currRobot)
+        row, col = currRobot.get_coord()
+        if (charging >> (row * width + col)) & 1:
+            if currRobot.charge(robot_charge) and replay is not None:
+                replay.add_robot_changes(currRobot, False)
+
+
+def unshare_robot(robots: dict, map: Map, robot: Robot) -> Robot:
+    """
+    Robots shared with a forked GameState are copied before they change,
+    the copy takes their place in robots and on the map
+    """
+    if not robot.is_shared():
+        return robot
+    newRobot = robot.copy()
+    robots[robot.get_name()] = newRobot
+    map.replace_robot(robot, newRobot)
+    return newRobot
+
+
+def decide_winner(red_terra_tiles: int, blue_terra_tiles: int, red_robots: int, blue_robots: int,
+                  red_metal: int, blue_metal: int, red_time: float, blue_time: float) -> Team:
+    """
+    Winner of a game played to the last turn: terra tiles, then robots,
+    then metal, then time left (less is better), then red by default
+    """
+    if (red_terra_tiles > blue_terra_tiles):
+        return Team.RED
+    elif (blue_terra_tiles > red_terra_tiles):
+        return Team.BLUE
+    elif (red_robots > blue_robots):
+        return Team.RED
+    elif (blue_robots > red_robots):
+        return Team.BLUE
+    elif (red_metal > blue_metal):
+        return Team.RED
+    elif (blue_metal > red_metal):
+        return Team.BLUE
+    elif (red_time < blue_time):
+        return Team.RED
+    elif (blue_time < red_time):
+        return Team.BLUE
+    else:
+        # red wins by default
+        return Team.RED
+
 
 class GameState:
     """ 
@@ -18,11 +93,12 @@ class GameState:
     modify the true game state
     """
 
-    def __init__(self, info : dict, red_robots : dict, blue_robots : dict, replay: Replay, map: Map):
+    def __init__(self, info : dict, red_robots : dict, blue_robots : dict, replay: Replay, map: Map, action_log: ActionLog = None):
         # General Game Information
         self.__map: Map = map
         self.__replay = replay
         self.__info = info
+        self.__action_log = action_log
 
         # Robot Information
         self.__red_robots: dict[str, Robot] = red_robots
@@ -32,6 +108,25 @@ class GameState:
         self.__robot_spawn_cost = GameConstants.ROBOT_SPAWN_COST
         self.__robot_transform_cost = GameConstants.ROBOT_TRANSFORM_COST
 
+        # Distance Fields, (team, target, checkCollisions) -> (map versions, distances, targets)
+        self.__fields = {}
+
+        # Speculation, savepoints into one undo log of (function, args), None when not speculating
+        self.__savepoints = []
+        self.__undo = None
+
+        # Forks name their robots from their own counter, None for the game's state
+        self.__robot_counter = None
+
+        # Change feed, events since the oldest team's turn started and where each team's began
+        self.__changes = []
+        self.__change_starts = {team: (0, info.get(f"{team.name.lower()}_metal")) for team in (Team.RED, Team.BLUE)}
+        self.__turn_changes = {}
+        self.__seen = {Team.RED: {}, Team.BLUE: {}}    # enemy robots each team could see when its turn started
+
+        # GameInfo handed out by get_info, its fields are cleared by every change
+        self.__game_info = None
+
     def __str__(self):
         """
         String representation of the GameState object
@@ -39,30 +134,27 @@ class GameState:
         return f""
 
     def check_for_collision(self, row: int, col: int) -> RobotInfo:
-        # Get current robots
+        # Get current team
         currTeam = self.__info.get("team")
-        blue_robots = self.__blue_robots
-        red_robots = self.__red_robots
 
         # Check if grid position is visible
         if self.__map.get_tile_state(row, col, currTeam) == TileState.ILLEGAL:
             return None
 
-        # Check red and blue robots
-        for robot_name in red_robots.keys():
-            if (row, col) == red_robots.get(robot_name).get_coord():
-                return red_robots.get(robot_name).info()
-        for robot_name in blue_robots.keys():
-            if (row, col) == blue_robots.get(robot_name).get_coord():
-                return blue_robots.get(robot_name).info()
-
-        # Otherwise return clear
-        return None
+        # Check occupancy index
+        robot = self.__map.get_robot_at(row, col)
+        if robot is None:
+            return None
+        return robot.info()
 
-    def optimal_path(self, startRow: int, startCol: int, endRow: int, endCol: int, checkCollisions=True) -> tuple[Direction,int]:
+    def optimal_path(self, startRow: int, startCol: int, endRow: int, endCol: int, checkCollisions=True, method="bfs") -> tuple[Direction,int]:
         '''
-        Find the optimal path using BFS
+        Find the optimal path using BFS, or A* with method="astar" (same
+        distance, but the first step may differ between equally short paths)
         '''
+        if method not in ("bfs", "astar"):
+            raise ValueError(f"Unknown path method {method}, expected bfs or astar")
+
         # Check if positions are valid
         currTeam = self.__info.get("team")
         startTile = self.__map.get_tile_state(startRow, startCol, currTeam)
@@ -71,32 +163,70 @@ class GameState:
         endTile = self.__map.get_tile_state(endRow, endCol, currTeam)
         if (endTile == TileState.ILLEGAL or endTile == TileState.IMPASSABLE):
             return (None, -1)
+        if method == "astar":
+            return self.__astar_path(startRow, startCol, endRow, endCol, checkCollisions)
 
         # Otherwise, preform search
+        map = self.__map
+        neighbors, fog, impassable = map.get_neighbors(), map.get_fog(currTeam), map.get_impassable()
+        occupancy = map.get_occupancy() if checkCollisions else {}
+        end = map.get_index(endRow, endCol)
         visited = set()
-        queue = deque([(None, startRow, startCol, 0)])
+        queue = deque([(None, map.get_index(startRow, startCol), 0)])
         while (queue):
-            dir, queueRow, queueCol, moves = queue.popleft()
-            if (endRow == queueRow and endCol == queueCol): return (dir, moves)
-            for newDir in Direction:
-                newRow, newCol = queueRow + \
-                    newDir.value[0], queueCol + newDir.value[1]
-                tileState = self.__map.get_tile_state(newRow, newCol, currTeam)
+            dir, index, moves = queue.popleft()
+            if (index == end): return (dir, moves)
+            for newDir, newIndex in neighbors[index]:
                 # Check if its legal
-                if (tileState == TileState.ILLEGAL or tileState == TileState.IMPASSABLE):
+                if (fog[newIndex] or impassable[newIndex] or newIndex in occupancy):
                     continue
-                if (checkCollisions and self.check_for_collision(newRow, newCol) != None):
+                if (newIndex not in visited):
+                    queue.append((dir or newDir, newIndex, moves+1))
+                    visited.add(newIndex)
+
+        # If we reached this point, a path to the co-ordinates isn't possible
+        return (None, -1)
+
+    def __astar_path(self, startRow: int, startCol: int, endRow: int, endCol: int, checkCollisions: bool) -> tuple[Direction,int]:
+        # A* with the Chebyshev distance, exact for 8-direction unit moves
+        map = self.__map
+        neighbors, fog, impassable = map.get_neighbors(), map.get_fog(self.__info.get("team")), map.get_impassable()
+        occupancy = map.get_occupancy() if checkCollisions else {}
+        rows, cols = map.get_rows(), map.get_cols()
+        start, end = map.get_index(startRow, startCol), map.get_index(endRow, endCol)
+
+        # Heap of (estimate, remaining, index), nearer the end first on ties
+        remaining = max(abs(startRow - endRow), abs(startCol - endCol))
+        heap = [(remaining, remaining, start)]
+        moves = {start: 0}
+        firstDir = {start: None}
+        while (heap):
+            estimate, remaining, index = heapq.heappop(heap)
+            if (index == end): return (firstDir[index], moves[index])
+            # Skip entries superseded by a shorter path
+            if (estimate > moves[index] + remaining): continue
+            newMoves = moves[index] + 1
+            dir = firstDir[index]
+            for newDir, newIndex in neighbors[index]:
+                # Check if its legal
+                if (fog[newIndex] or impassable[newIndex] or newIndex in occupancy):
                     continue
-                if ((newRow, newCol) not in visited):
-                    if dir == None:
-                        queue.append((newDir, newRow, newCol, moves+1))
-                    else:
-                        queue.append((dir, newRow, newCol, moves+1))
-                    visited.add((newRow, newCol))
+                if (newMoves < moves.get(newIndex, newMoves + 1)):
+                    moves[newIndex] = newMoves
+                    firstDir[newIndex] = dir or newDir
+                    remaining = max(abs(rows[newIndex] - endRow), abs(cols[newIndex] - endCol))
+                    heapq.heappush(heap, (newMoves + remaining, remaining, newIndex))
 
         # If we reached this point, a path to the co-ordinates isn't possible
         return (None, -1)
 
+    def get_static_distance(self, startRow: int, startCol: int, endRow: int, endCol: int) -> int:
+        '''
+        Moves between two tiles ignoring fog and robots (-1 if there is no path),
+        a lower bound for optimal_path, looked up from a per-map table
+        '''
+        return self.__map.get_static_distance(startRow, startCol, endRow, endCol)
+
     def robot_to_base(self, robotName: str, checkCollisions=True) -> tuple[Direction,int]:
         '''
         Find the optimal path using BFS
@@ -120,32 +250,120 @@ class GameState:
             return (None,-1)
 
         # Otherwise, preform search
+        map = self.__map
+        neighbors, fog, impassable = map.get_neighbors(), map.get_fog(currTeam), map.get_impassable()
+        occupancy = map.get_occupancy() if checkCollisions else {}
+        terraform = map.get_terraform_array()
+        sign = -1 if currTeam == Team.RED else 1
         visited = set()
-        queue = deque([(None, startRow, startCol, 0)])
+        queue = deque([(None, map.get_index(startRow, startCol), 0)])
         while (queue):
-            dir, queueRow, queueCol, moves = queue.popleft()
-            if (self.__map.is_terraformed(currTeam, queueRow, queueCol)):
+            dir, index, moves = queue.popleft()
+            if (terraform[index] * sign > 0):
                 return (dir, moves)
-            for newDir in Direction:
-                newRow, newCol = queueRow + \
-                    newDir.value[0], queueCol + newDir.value[1]
-                tileState = self.__map.get_tile_state(newRow, newCol, currTeam)
+            for newDir, newIndex in neighbors[index]:
                 # Check if its legal
-                if (tileState == TileState.ILLEGAL or tileState == TileState.IMPASSABLE):
+                if (fog[newIndex] or impassable[newIndex] or newIndex in occupancy):
                     continue
-                if (checkCollisions and self.check_for_collision(newRow, newCol) != None):
-                    continue
-                if ((newRow, newCol) not in visited):
-                    if dir == None:
-                        queue.append((newDir, newRow, newCol, moves+1))
-                    else:
-                        queue.append((dir, newRow, newCol, moves+1))
-                    visited.add((newRow, newCol))
+                if (newIndex not in visited):
+                    queue.append((dir or newDir, newIndex, moves+1))
+                    visited.add(newIndex)
 
         # If we reached this point, a path to a terraform tile isn't possible
         return (None, -1)
 
 
+    def __distance_field(self, target: PathTarget, checkCollisions: bool) -> tuple[list[int], bytearray]:
+        # Reuse the field until fog or terraform ownership change (or robots move, with collisions)
+        currTeam = self.__info.get("team")
+        map = self.__map
+        key = (currTeam, target, checkCollisions)
+        version = (map.get_terrain_version(), map.get_robot_version() if checkCollisions else 0)
+        cached = self.__fields.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        # Target tiles, whether or not a robot stands on them
+        if target == PathTarget.ALLY_TERRAFORMED:
+            sources = map.get_ally_terraformed(currTeam)
+        elif target == PathTarget.MINES:
+            sources = map.get_visible_mines(currTeam)
+        elif target == PathTarget.FOG_FRONTIER:
+            sources = map.get_frontier(currTeam)
+        else:
+            raise ValueError(f"Unknown path target {target}")
+        neighbors, fog, impassable = map.get_neighbors(), map.get_fog(currTeam), map.get_impassable()
+        size = map.get_height() * map.get_width()
+        targets = bytearray(size)
+
+        # Multi-source BFS outwards from every reachable target
+        occupancy = map.get_occupancy() if checkCollisions else {}
+        distances = [-1] * size
+        queue = deque()
+        for index in sorted(sources):
+            targets[index] = 1
+            if not (fog[index] or impassable[index] or index in occupancy):
+                distances[index] = 0
+                queue.append(index)
+        while (queue):
+            index = queue.popleft()
+            moves = distances[index] + 1
+            for _, newIndex in neighbors[index]:
+                # Check if its legal
+                if (distances[newIndex] != -1 or fog[newIndex] or impassable[newIndex] or newIndex in occupancy):
+                    continue
+                distances[newIndex] = moves
+                queue.append(newIndex)
+
+        self.__fields[key] = (version, distances, targets)
+        return distances, targets
+
+    def get_distance_field(self, target: PathTarget, checkCollisions=True) -> list[list[int]]:
+        '''
+        Moves from each tile to the nearest target tile (-1 if unreachable),
+        computed once and reused until fog or terraform ownership change (or robots
+        move, when checking collisions)
+        '''
+        distances, _ = self.__distance_field(target, checkCollisions)
+        width = self.__map.get_width()
+        return [distances[row * width:(row + 1) * width] for row in range(self.__map.get_height())]
+
+    def nearest_path(self, target: PathTarget, row: int, col: int, checkCollisions=True) -> tuple[Direction,int]:
+        '''
+        First step and moves to the nearest target tile, same result as a BFS
+        from (row, col), answered from the cached distance field
+        '''
+        # Check if position is valid
+        currTeam = self.__info.get("team")
+        startTile = self.__map.get_tile_state(row, col, currTeam)
+        if (startTile == TileState.ILLEGAL or startTile == TileState.IMPASSABLE):
+            return (None, -1)
+
+        distances, targets = self.__distance_field(target, checkCollisions)
+        index = self.__map.get_index(row, col)
+        if (targets[index]):
+            return (None, 0)
+
+        # Best neighbor, earliest direction on ties
+        best = (None, -1)
+        for dir, newIndex in self.__map.get_neighbors()[index]:
+            moves = distances[newIndex]
+            if moves != -1 and (best[1] == -1 or moves + 1 < best[1]):
+                best = (dir, moves + 1)
+        return best
+
+    def robot_to_nearest(self, robotName: str, target: PathTarget, checkCollisions=True) -> tuple[Direction,int]:
+        '''
+        nearest_path from an ally robot, robot_to_nearest(name, PathTarget.ALLY_TERRAFORMED)
+        matches robot_to_base(name)
+        '''
+        robots = self.__get_ally_robots_obj()
+        if (robots.get(robotName) == None):
+            return (None,-1)
+        row, col = robots.get(robotName).get_coord()
+        return self.nearest_path(target, row, col, checkCollisions)
+
+
     def __assert_can_spawn_robot(self, type: RobotType, row: int, col: int):
         # Return False for incorrect move
         if (type == None):
@@ -180,51 +398,30 @@ class GameState:
 
     def spawn_robot(self, type: RobotType, row: int, col: int) -> RobotInfo:
         self.__assert_can_spawn_robot(type,row,col)
+        if self.__action_log is not None:
+            self.__action_log.record("spawn_robot", type, row, col)
 
         # Get current robots
         currTeam = self.__info.get("team")
         robots = self.__get_ally_robots_obj()
+        self.__changed()
 
         # Check and preform metal cost
         if (currTeam == Team.BLUE):
             field_name = "blue_metal"
         else:
             field_name = "red_metal"
+        self.__log(self.__info.update, {field_name: self.get_metal()})
         self.__info.update({field_name: self.get_metal() - self.__robot_spawn_cost})
 
         # Spawn robot
-        new_robot = None
-        if (type == RobotType.MINER):
-            new_robot = Miner_Robot(
-                row,
-                col,
-                currTeam,
-                self.__map.get_height(),
-                self.__map.get_width(),
-                GameConstants.MINER_ACTION_COST
-            )
-        elif (type == RobotType.EXPLORER):
-            new_robot = Explorer_Robot(
-                row,
-                col,
-                currTeam,
-                self.__map.get_height(),
-                self.__map.get_width(),
-                GameConstants.EXPLORER_ACTION_COST
-            )
-        else:
-            new_robot = Terraformer_Robot(
-                row,
-                col,
-                currTeam,
-                self.__map.get_height(),
-                self.__map.get_width(),
-                GameConstants.TERRAFORMER_ACTION_COST
-            )
+        new_robot = self.__new_robot(type, row, col, currTeam)
+        self.__save_robots(robots)
         robots.update({new_robot.get_name() : new_robot})
+        self.__add_robot(new_robot)
 
         # Add Robot to Replay File and return
-        self.__replay.add_robot_changes(new_robot, False)
+        self.__record_appeared(new_robot)
         return new_robot.info()
 
 
@@ -249,25 +446,42 @@ class GameState:
 
     def robot_action(self, robotName: str):
         self.__assert_can_robot_action(robotName)
+        if self.__action_log is not None:
+            self.__action_log.record("robot_action", robotName)
+        self.__apply_action(robotName)
 
+    def __apply_action(self, robotName: str) -> None:
+        self.__changed()
         # Get current robots
         currTeam = self.get_team()
         robots = self.__get_ally_robots_obj()
 
         # Take robot action
-        currRobot = robots.get(robotName)
-        retList = currRobot.take_action(self.__map)
+        currRobot = self.__unshare_robot(robots, robots.get(robotName))
+        self.__log(self.__restore_robot, currRobot, currRobot.get_state())
+        if (currRobot.get_type() == RobotType.TERRAFORMER):
+            row, col = currRobot.get_coord()
+            index, prev = self.__map.get_index(row, col), self.__map.get_terraform_status(row, col)
+            self.__log(self.__map.set_terraform, index, prev)
+        retList = currRobot.act(self.__map)
+        self.__map.mark_robot_dirty(currRobot)
 
         # Change metal based on action
         if (currRobot.get_type() == RobotType.MINER):
+            self.__log(self.__info.update, {'blue_metal': self.__info.get('blue_metal'), 'red_metal': self.__info.get('red_metal')})
             if (currTeam == Team.BLUE):
                 self.__info.update({'blue_metal':self.__info.get('blue_metal') + retList[0]})
             else:
                 self.__info.update({'red_metal':self.__info.get('red_metal') + retList[0]})
         elif (currRobot.get_type() == RobotType.TERRAFORMER):
-            self.__replay.add_terraformed_tiles(retList)
+            self.__changes.append(("terraformed", index, prev))
+            if self.__replay is not None:
+                self.__replay.add_terraformed_tiles(retList)
         elif (currRobot.get_type() == RobotType.EXPLORER):
-            self.__replay.add_explored_tiles(retList)
+            self.__log(self.__map.unexplore, currTeam, retList)
+            self.__changes.append(("explored", currTeam, retList))
+            if self.__replay is not None:
+                self.__replay.add_explored_tiles(retList)
             
 
     def __assert_can_move_robot(self, robotName : str, move : Direction):
@@ -277,7 +491,7 @@ class GameState:
 
         # Get current robots
         currTeam = self.get_team()
-        robots = self.get_ally_robots()
+        robots = self.__get_ally_robots_obj()
 
         # Get Robot
         currRobot = robots.get(robotName)
@@ -285,7 +499,7 @@ class GameState:
             raise IllegalMoveError(f"Unknown robot {robotName}")
 
         # Check move validity
-        row, col = currRobot.row, currRobot.col
+        row, col = currRobot.get_coord()
         newRow, newCol = row + move.value[0], col + move.value[1]
         tile_state = self.__map.get_tile_state(newRow, newCol, currTeam)
         if tile_state == TileState.ILLEGAL:
@@ -304,7 +518,12 @@ class GameState:
 
     def move_robot(self, robotName: str, move: Direction) -> bool:
         self.__assert_can_move_robot(robotName, move)
+        if self.__action_log is not None:
+            self.__action_log.record("move_robot", robotName, move)
+        return self.__apply_move(robotName, move)
 
+    def __apply_move(self, robotName: str, move: Direction) -> bool:
+        self.__changed()
         robots = self.__get_ally_robots_obj()
 
         currRobot = robots.get(robotName)
@@ -314,24 +533,33 @@ class GameState:
         # Check for collision
         altRobotInfo = self.check_for_collision(newRow, newCol)
         if (altRobotInfo != None):
+            self.__save_robots(robots)
             robots.pop(robotName)
+            self.__remove_robot(currRobot)
             if (self.__blue_robots.get(altRobotInfo.name) != None):
                 altRobot = self.__blue_robots.get(altRobotInfo.name)
+                self.__save_robots(self.__blue_robots)
                 self.__blue_robots.pop(altRobotInfo.name)
             elif (self.__red_robots.get(altRobotInfo.name) != None):
                 altRobot = self.__red_robots.get(altRobotInfo.name)
+                self.__save_robots(self.__red_robots)
                 self.__red_robots.pop(altRobotInfo.name)
             else:
                 raise UnknownRobotInternalError(f"Unknown robot - {altRobotInfo}")
+            self.__remove_robot(altRobot)
             # Remove robot in replay file
-            self.__replay.add_robot_changes(currRobot, True)
-            self.__replay.add_robot_changes(altRobot, True)
+            self.__record_died(currRobot)
+            self.__record_died(altRobot)
             return True
 
         # Preform Move
+        currRobot = self.__unshare_robot(robots, currRobot)
+        self.__remove_robot(currRobot)
+        self.__log(self.__restore_robot, currRobot, currRobot.get_state())
         result = currRobot.make_move(move)
+        self.__add_robot(currRobot)
         if (result):
-            self.__replay.add_robot_changes(currRobot, False)
+            self.__record_moved(currRobot, self.__map.get_index(row, col))
         return result
 
 
@@ -341,7 +569,7 @@ class GameState:
         if (type == None):
             raise IllegalTransformError(f"Invalid robot type {type}")
 
-        robots = self.get_ally_robots()
+        robots = self.__get_ally_robots_obj()
 
         # Take robot action
         if (robots.get(robotName) == None):
@@ -362,7 +590,12 @@ class GameState:
 
     def transform_robot(self, robotName: str, type: RobotType) -> RobotInfo:
         self.__assert_can_transform_robot(robotName, type)
-        
+        if self.__action_log is not None:
+            self.__action_log.record("transform_robot", robotName, type)
+        return self.__apply_transform(robotName, type)
+
+    def __apply_transform(self, robotName: str, type: RobotType) -> RobotInfo:
+        self.__changed()
         # Get current robots
         currTeam = self.get_team()
         robots = self.__get_ally_robots_obj()
@@ -374,76 +607,384 @@ class GameState:
             field_name = "blue_metal"
         else:
             field_name = "red_metal"
+        self.__log(self.__info.update, {field_name: self.get_metal()})
         self.__info.update({field_name: self.get_metal() - self.__robot_spawn_cost})
 
         # Get current co-ordinates
         row, col = currRobot.get_coord()
         prevBattery = currRobot.get_battery()
+        self.__save_robots(robots)
         robots.pop(robotName)
+        self.__remove_robot(currRobot)
 
         # Add Deleted Robot to Replay File
-        self.__replay.add_robot_changes(currRobot, True)
+        self.__record_died(currRobot)
 
         # Spawn robot and set battery
-        new_robot = None
-        if (type == RobotType.MINER):
-            new_robot = Miner_Robot(
-                row,
-                col,
-                currTeam,
-                self.__map.get_height(),
-                self.__map.get_width(),
-                GameConstants.MINER_ACTION_COST
-            )
-        elif (type == RobotType.EXPLORER):
-            new_robot = Explorer_Robot(
-                row,
-                col,
-                currTeam,
-                self.__map.get_height(),
-                self.__map.get_width(),
-                GameConstants.EXPLORER_ACTION_COST
-            )
-        else:
-            new_robot = Terraformer_Robot(
-                row,
-                col,
-                currTeam,
-                self.__map.get_height(),
-                self.__map.get_width(),
-                GameConstants.TERRAFORMER_ACTION_COST
-            )
+        new_robot = self.__new_robot(type, row, col, currTeam)
         new_robot.set_battery(prevBattery)
 
         # Add New Robot to Replay File
         robots.update({new_robot.get_name() : new_robot})
-        self.__replay.add_robot_changes(new_robot, False)
+        self.__add_robot(new_robot)
+        self.__record_appeared(new_robot)
         return new_robot.info()
 
 
+    def submit_actions(self, orders: list) -> list[OrderResult]:
+        """
+        Carries out many orders in one call. Each order is a tuple
+        (robot, move, action, transform): the robot's name or RobotInfo, a
+        Direction or None, whether to take the robot's action, and a RobotType
+        or None. Later items can be left out.
+
+        Orders run in list order, each one moving, then acting, then
+        transforming its robot. Every step is checked once, against the state
+        left by the steps before it, and an order stops at its first illegal
+        step while the rest still run. Returns an OrderResult per order
+        """
+        robots = self.__get_ally_robots_obj()
+        results = []
+        for order in orders:
+            robotName, move, action, transform = (*order, *(None, None, False, None)[len(order):])
+            if isinstance(robotName, RobotInfo):
+                robotName = robotName.name
+            moved = acted = transformed = collided = False
+            error = None
+            try:
+                if move is not None:
+                    self.__assert_can_move_robot(robotName, move)
+                    if self.__action_log is not None:
+                        self.__action_log.record("move_robot", robotName, move)
+                    moved = self.__apply_move(robotName, move)
+                    collided = robotName not in robots
+                if action and not collided:
+                    self.__assert_can_robot_action(robotName)
+                    if self.__action_log is not None:
+                        self.__action_log.record("robot_action", robotName)
+                    self.__apply_action(robotName)
+                    acted = True
+                if transform is not None and not collided:
+                    self.__assert_can_transform_robot(robotName, transform)
+                    if self.__action_log is not None:
+                        self.__action_log.record("transform_robot", robotName, transform)
+                    robotName = self.__apply_transform(robotName, transform).name
+                    transformed = True
+            except (IllegalMoveError, IllegalActionError, IllegalTransformError) as e:
+                error = str(e)
+
+            robot = robots.get(robotName)
+            results.append(OrderResult(robotName, robot.info() if robot is not None else None,
+                moved, acted, transformed, error))
+        return results
+
+
     def __get_ally_robots_obj(self):
         if self.get_team() == Team.BLUE:
             return self.__blue_robots
         else:
             return self.__red_robots
 
+    def __new_robot(self, type: RobotType, row: int, col: int, team: Team) -> Robot:
+        if (type == RobotType.MINER):
+            robotClass, actionCost = Miner_Robot, GameConstants.MINER_ACTION_COST
+        elif (type == RobotType.EXPLORER):
+            robotClass, actionCost = Explorer_Robot, GameConstants.EXPLORER_ACTION_COST
+        else:
+            robotClass, actionCost = Terraformer_Robot, GameConstants.TERRAFORMER_ACTION_COST
+        if self.__robot_counter is None:
+            return robotClass(row, col, team, self.__map.get_height(), self.__map.get_width(), actionCost)
+
+        # Leave the game's counter as it was, so forks don't change its robot names
+        gameCounter, Robot.counter = Robot.counter, self.__robot_counter
+        try:
+            return robotClass(row, col, team, self.__map.get_height(), self.__map.get_width(), actionCost)
+        finally:
+            self.__robot_counter, Robot.counter = Robot.counter, gameCounter
+
+    def __unshare_robot(self, robots: dict, robot: Robot) -> Robot:
+        newRobot = unshare_robot(robots, self.__map, robot)
+        if newRobot is not robot:
+            self.__log(self.__replace_robot, robots, newRobot, robot)
+        return newRobot
+
+    def __replace_robot(self, robots: dict, robot: Robot, newRobot: Robot) -> None:
+        robots[robot.get_name()] = newRobot
+        self.__map.replace_robot(robot, newRobot)
+
+
+    def __changed(self) -> None:
+        # Called before every change to the game state
+        if self.__game_info is not None:
+            self.__game_info.freeze()
+            self.__game_info = None
+
+    def __record_appeared(self, robot: Robot) -> None:
+        self.__changes.append(("appeared", robot.get_name()))
+        if self.__replay is not None:
+            self.__replay.add_robot_changes(robot, False)
+
+    def __record_moved(self, robot: Robot, prevIndex: int) -> None:
+        self.__changes.append(("moved", robot.get_name(), prevIndex))
+        if self.__replay is not None:
+            self.__replay.add_robot_changes(robot, False)
+
+    def __record_died(self, robot: Robot) -> None:
+        # Removed robots never change again, so the robot itself is kept
+        self.__changes.append(("died", robot))
+        if self.__replay is not None:
+            self.__replay.add_robot_changes(robot, True)
+
+
+    """ CHANGE FEED """
+
+    def start_turn(self) -> None:
+        """
+        Called by the engine right after begin_turn, not by bots. Sums up what
+        the current team can see changed since its previous turn started
+        """
+        self.__changed()
+        team = self.get_team()
+        map = self.__map
+        fog, terraform, width = map.get_fog(team), map.get_terraform_array(), map.get_width()
+        start, startMetal = self.__change_starts[team]
+
+        # Net effect of the events since then
+        explored = []
+        touched = {}        # index -> terraform value before its first change
+        born = set()
+        prevIndexes = {}    # name -> tile before its first move
+        died = {}
+        for event in self.__changes[start:]:
+            kind = event[0]
+            if kind == "explored":
+                if event[1] == team:
+                    explored.extend(event[2])
+            elif kind == "terraformed":
+                touched.setdefault(event[1], event[2])
+            elif kind == "appeared":
+                born.add(event[1])
+            elif kind == "moved":
+                prevIndexes.setdefault(event[1], event[2])
+            elif event[1].get_name() in born:
+                born.discard(event[1].get_name())
+            else:
+                died[event[1].get_name()] = event[1]
+
+        def visible(robot: Robot) -> bool:
+            row, col = robot.get_coord()
+            return robot.get_team() == team or not fog[row * width + col]
+
+        def find(name: str) -> Robot:
+            robot = self.__red_robots.get(name)
+            return robot if robot is not None else self.__blue_robots.get(name)
+
+        appeared = {}
+        for name in born:
+            robot = find(name)
+            if visible(robot):
+                appeared[name] = robot.info()
+        moved = {}
+        for name, prevIndex in prevIndexes.items():
+            robot = find(name)
+            if robot is None or name in born:
+                continue
+            row, col = robot.get_coord()
+            if row * width + col != prevIndex and visible(robot):
+                moved[name] = robot.info()
+
+        died = {name: robot.info() for name, robot in died.items() if visible(robot)}
+
+        # Enemy robots that left view or came into it, against what the team saw last turn
+        seen, lastSeen = self.get_enemy_robots(), self.__seen[team]
+        hidden = {name: robot for name, robot in lastSeen.items() if name not in seen and name not in died}
+        revealed = {name: robot for name, robot in seen.items()
+            if name not in lastSeen and name not in appeared and name not in moved}
+        self.__seen[team] = seen
+
+        metal = self.get_metal()
+        self.__turn_changes[team] = TurnChanges(
+            explored=explored,
+            terraformed=[divmod(index, width) for index in sorted(touched)
+                if terraform[index] != touched[index] and not fog[index]],
+            appeared=appeared,
+            moved=moved,
+            died=died,
+            hidden=hidden,
+            revealed=revealed,
+            metal=metal - startMetal,
+        )
+
+        # Drop events both teams have summed up, unless speculation still points into them
+        self.__change_starts[team] = (len(self.__changes), metal)
+        first = min(start for start, _ in self.__change_starts.values())
+        if first > 0 and not self.__savepoints:
+            del self.__changes[:first]
+            self.__change_starts = {key: (index - first, value) for key, (index, value) in self.__change_starts.items()}
+
+    def get_changes_since_last_turn(self) -> TurnChanges:
+        """
+        What the team can see changed between the start of its previous turn
+        and the start of this one: its own explored tiles and, on tiles it can
+        see, terraform changes and robots that appeared, moved or died, and
+        enemy robots that left its view or came into it. Also the change in
+        its metal. On the team's first turn it covers everything since the
+        game started
+        """
+        return self.__turn_changes.get(self.get_team())
+
+
+    """ FORKING """
+
+    def fork(self) -> "GameState":
+        """
+        Independent copy of the game for simulation, such as tree search.
+        Tiles and robots are shared with this state until either changes
+        them, so a fork costs about as much as copying the robot dicts. Forks
+        have no replay or action log, and end_turn plays on into the other
+        team's turn. Speculation must be committed or rolled back first
+        """
+        if self.__savepoints:
+            raise SpeculationError("fork called while speculating")
+        for robots in (self.__red_robots, self.__blue_robots):
+            for robot in robots.values():
+                robot.share()
+        child = GameState(dict(self.__info), dict(self.__red_robots), dict(self.__blue_robots), None, self.__map.fork())
+        child.__fields = dict(self.__fields)
+        child.__changes = list(self.__changes)
+        child.__change_starts = dict(self.__change_starts)
+        child.__turn_changes = dict(self.__turn_changes)
+        child.__seen = dict(self.__seen)
+        child.__robot_counter = Robot.counter if self.__robot_counter is None else self.__robot_counter
+        return child
+
+    def end_turn(self) -> None:
+        """
+        Ends the current team's turn in a fork and starts the other team's,
+        like the engine does: blue plays first each turn, then passive metal,
+        and robots are reset and charged on ally terraformed tiles
+        """
+        if self.__robot_counter is None:
+            raise ForkError("end_turn is only valid on a fork, the engine ends the game's own turns")
+        if self.__savepoints:
+            raise SpeculationError("end_turn called while speculating")
+        if self.get_team() == Team.BLUE:
+            self.__info.update({"team": Team.RED})
+        else:
+            self.__info.update({"team": Team.BLUE, "turn": self.get_turn() + 1})
+        begin_turn(self.__info, self.__get_ally_robots_obj(), self.__map)
+        self.start_turn()
+
+
+    """ SPECULATION """
+
+    def begin_speculation(self) -> None:
+        """
+        Starts a what-if: every state-changing call from here on can be undone
+        with rollback, or kept with commit. Speculation can be nested, each
+        rollback or commit ends the latest one. Rolling back costs as much as
+        the calls it undoes, and robots spawned while speculating are forgotten
+        (their names are reused). Speculation still open at the end of the
+        turn is rolled back
+        """
+        if self.__undo is None:
+            self.__undo = []
+        self.__savepoints.append((
+            len(self.__undo),
+            Robot.counter if self.__robot_counter is None else self.__robot_counter,
+            self.__replay.mark() if self.__replay is not None else None,
+            self.__action_log.mark() if self.__action_log is not None else None,
+            set(),      # robot dicts already saved since this savepoint
+            len(self.__changes),
+        ))
+
+    def is_speculating(self) -> bool:
+        return bool(self.__savepoints)
+
+    def commit(self) -> None:
+        """
+        Keeps the changes of the latest speculation, which become part of the
+        one around it if any
+        """
+        if not self.__savepoints:
+            raise SpeculationError("commit called without begin_speculation")
+        saved = self.__savepoints.pop()[4]
+        if self.__savepoints:
+            self.__savepoints[-1][4].update(saved)
+        else:
+            self.__undo = None
+
+    def rollback(self) -> None:
+        """
+        Undoes every call since the latest begin_speculation
+        """
+        if not self.__savepoints:
+            raise SpeculationError("rollback called without begin_speculation")
+        length, counter, replayMark, actionMark, _, changesMark = self.__savepoints.pop()
+        self.__changed()
+        undo = self.__undo
+        while len(undo) > length:
+            function, args = undo.pop()
+            function(*args)
+        if self.__robot_counter is None:
+            Robot.counter = counter
+        else:
+            self.__robot_counter = counter
+        if replayMark is not None:
+            self.__replay.discard_since(replayMark)
+        if actionMark is not None:
+            self.__action_log.discard_since(actionMark)
+        del self.__changes[changesMark:]
+        if not self.__savepoints:
+            self.__undo = None
+
+    def __log(self, function, *args) -> None:
+        # Records how to undo the change about to be made
+        if self.__undo is not None:
+            self.__undo.append((function, args))
+
+    def __save_robots(self, robots: dict) -> None:
+        # Copied once per savepoint before robots are added or removed, which keeps their order
+        if self.__undo is not None and id(robots) not in self.__savepoints[-1][4]:
+            self.__savepoints[-1][4].add(id(robots))
+            self.__undo.append((self.__restore_robots, (robots, dict(robots))))
+
+    def __add_robot(self, robot: Robot) -> None:
+        self.__map.add_robot(robot)
+        self.__log(self.__map.remove_robot, robot)
+
+    def __remove_robot(self, robot: Robot) -> None:
+        self.__map.remove_robot(robot)
+        self.__log(self.__map.add_robot, robot)
+
+    def __restore_robot(self, robot: Robot, state: tuple) -> None:
+        robot.set_state(state)
+        self.__map.mark_robot_dirty(robot)
+
+    @staticmethod
+    def __restore_robots(robots: dict, saved: dict) -> None:
+        robots.clear()
+        robots.update(saved)
+
 
 
     """ GETTERS """
 
     def get_info(self):
-        # State Game Info
-        return GameInfo(
-            ally_robots=self.get_ally_robots(),
-            enemy_robots=self.get_enemy_robots(),
-            map=self.get_map(),
-            metal=self.get_metal(),
-            team=self.get_team(),
-            robot_spawn_cost=self.get_spawn_cost(),
-            robot_transform_cost=self.get_transform_cost(),
-            time_left=self.get_time_left(),
-            turn=self.get_turn(),
-        )
+        # State Game Info, the same lazy object until the next change
+        if self.__game_info is None:
+            self.__game_info = GameInfo({
+                "ally_robots": self.get_ally_robots,
+                "enemy_robots": self.get_enemy_robots,
+                "map": self.get_map,
+                "metal": self.get_metal,
+                "team": self.get_team,
+                "robot_spawn_cost": self.get_spawn_cost,
+                "robot_transform_cost": self.get_transform_cost,
+                "time_left": self.get_time_left,
+                "turn": self.get_turn,
+            })
+        return self.__game_info
 
 
     def get_ally_robots(self) -> dict:
@@ -467,13 +1008,20 @@ class GameState:
         else:
             enemy_robots = self.__blue_robots
 
+        # Enemy robots outside our fog, as one bitboard
+        map = self.__map
+        enemyTeam = Team.RED if currTeam == Team.BLUE else Team.BLUE
+        visible = map.get_robot_bits(enemyTeam) & ~map.get_fog_bits(currTeam)
+        if not visible:
+            return {}
+
         # Get all robots
         retDict = {}
-        for robot_name in enemy_robots.keys():
-            # Check if robots are visible
-            row, col = enemy_robots.get(robot_name).get_coord()
-            if (self.__map.get_tile_state(row, col, currTeam) != TileState.ILLEGAL):
-                retDict[robot_name] = enemy_robots.get(robot_name).info()
+        width = map.get_width()
+        for robot_name, robot in enemy_robots.items():
+            row, col = robot.get_coord()
+            if (visible >> (row * width + col)) & 1:
+                retDict[robot_name] = robot.info()
         return retDict
 
     def get_str_map(self) -> list:
@@ -481,22 +1029,58 @@ class GameState:
         return self.__map.get_str_map(currTeam)
 
     def get_map(self) -> list:
-        # Get CurrTeam and Map
+        # Get CurrTeam and Map, with robots on their tiles
+        currTeam = self.get_team()
+        return self.__map.get_map(currTeam)
+
+
+    def get_observation(self):
+        """
+        Team-relative NumPy planes of the map and robots, shaped
+        (len(OBSERVATION_PLANES), height, width), see src/observation.py
+        """
+        currTeam = self.get_team()
+        if currTeam == Team.BLUE:
+            ally_robots, enemy_robots = self.__blue_robots, self.__red_robots
+        else:
+            ally_robots, enemy_robots = self.__red_robots, self.__blue_robots
+        return build_observation(self.__map, currTeam, ally_robots, enemy_robots)
+
+    def get_fog_bitboard(self) -> int:
+        # Bit row * width + col is set for each fogged tile
+        return self.__map.get_fog_bits(self.get_team())
+
+    def get_ally_terraformed_bitboard(self) -> int:
+        return self.__map.get_owned_bits(self.get_team())
+
+    def get_enemy_terraformed_bitboard(self) -> int:
+        # Only tiles we can see
         currTeam = self.get_team()
-        currMap = self.__map.get_map(currTeam)
-        # Add Robot Info
-        currRobots = self.get_ally_robots()
-        for robot in currRobots:
-            info = currRobots[robot]
-            row, col = info.row, info.col
-            currMap[row][col].robot = info
-        enemyRobots = self.get_enemy_robots()
-        for robot in enemyRobots:
-            info = enemyRobots[robot]
-            row, col = info.row, info.col
-            currMap[row][col].robot = info
-        return currMap
+        enemyTeam = Team.RED if currTeam == Team.BLUE else Team.BLUE
+        return self.__map.get_owned_bits(enemyTeam) & ~self.__map.get_fog_bits(currTeam)
+
+    def get_visible_count(self) -> int:
+        return self.__map.get_visible_count(self.get_team())
+
+    def __tile_coords(self, indexes: set[int]) -> list[tuple[int, int]]:
+        width = self.__map.get_width()
+        return [divmod(index, width) for index in sorted(indexes)]
+
+    def get_fog_frontier(self) -> list[tuple[int, int]]:
+        # (row, col) of visible passable tiles next to fog, in row-major order
+        return self.__tile_coords(self.__map.get_frontier(self.get_team()))
+
+    def get_visible_mines(self) -> list[tuple[int, int]]:
+        # (row, col) of visible mining tiles, in row-major order
+        return self.__tile_coords(self.__map.get_visible_mines(self.get_team()))
+
+    def get_ally_terraformed_tiles(self) -> list[tuple[int, int]]:
+        # (row, col) of ally terraformed tiles, in row-major order
+        return self.__tile_coords(self.__map.get_ally_terraformed(self.get_team()))
 
+    def get_empty_ally_terraformed_tiles(self) -> list[tuple[int, int]]:
+        # (row, col) of ally terraformed tiles with no robot, in row-major order
+        return self.__tile_coords(self.__map.get_empty_ally_terraformed(self.get_team()))
 
     def get_metal(self):
         # Get Metal
@@ -1,11 +1,29 @@
 from src.game_constants import Team, TileState, GameConstants, RobotType, Direction
 from dataclasses import dataclass
 
-@dataclass
-class RobotInfo:
+
+class Slotted:
+    """
+    Pickling for frozen dataclasses with __slots__, which have no __dict__
+    and refuse attributes being set one at a time
+    """
+    __slots__ = ()
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+
+@dataclass(frozen=True)
+class RobotInfo(Slotted):
     """
     RobotInfo object contains all information about a robot
     """
+    __slots__ = ("battery", "acted", "moved", "action_cost", "row", "col", "team", "name", "type")
+
     battery: int
     acted: bool
     moved: bool
@@ -17,11 +35,14 @@ class RobotInfo:
     type: RobotType
 
 
-@dataclass
-class TileInfo:
+@dataclass(frozen=True)
+class TileInfo(Slotted):
     """
     TileInfo object contains all information about a tile
+    (shared between get_map calls, so it cannot be modified)
     """
+    __slots__ = ("state", "row", "col", "terraform", "mining", "robot")
+
     state: TileState
     row: int
     col: int
@@ -29,17 +50,79 @@ class TileInfo:
     mining: int
     robot: RobotInfo
 
-@dataclass
+@dataclass(frozen=True)
+class OrderResult:
+    """
+    OrderResult object contains the outcome of one order of submit_actions
+    """
+    name: str           # robot the order ended with (its new name after a transform)
+    robot: RobotInfo    # None if the robot was destroyed in a collision
+    moved: bool
+    acted: bool
+    transformed: bool
+    error: str          # why the order stopped early, None if every step was carried out
+
+@dataclass(frozen=True)
+class TurnChanges:
+    """
+    TurnChanges object contains what a team can see changed between the
+    start of its previous turn and the start of its current one
+    """
+    explored: list[tuple[int, int]]       # tiles the team explored
+    terraformed: list[tuple[int, int]]    # visible tiles whose terraform value changed, row-major
+    appeared: dict[str, RobotInfo]        # visible robots that were spawned (or transformed into)
+    moved: dict[str, RobotInfo]           # visible robots now on a different tile
+    died: dict[str, RobotInfo]            # robots destroyed (or transformed) on visible tiles, as they were last
+    hidden: dict[str, RobotInfo]          # enemy robots seen last turn that are out of view now, as they were last seen
+    revealed: dict[str, RobotInfo]        # enemy robots in view now that were not last turn, and did not appear or move
+    metal: int                            # change in the team's metal
+
 class GameInfo:
     """
-    GameInfo object contains all information about the game state
+    GameInfo object contains all information about the game state.
+    Each field is computed the first time it is read, so reading only turn
+    and metal stays cheap. The object keeps the state it was taken in,
+    get_info returns a new one after the game state changes
     """
+    FIELDS = ("ally_robots", "enemy_robots", "map", "metal", "team",
+        "robot_spawn_cost", "robot_transform_cost", "time_left", "turn")
+
     ally_robots: dict[str, RobotInfo]
     enemy_robots: dict[str, RobotInfo]
-    map: list[list[str]]
+    map: list[list[TileInfo]]
     metal: int
     team: Team
     robot_spawn_cost: int
     robot_transform_cost: int
     time_left: float
-    turn: int
\ No newline at end of file
+    turn: int
+
+    def __init__(self, loaders: dict):
+        # field -> function computing it
+        self._loaders = loaders
+
+    def __getattr__(self, name: str):
+        # Only called for fields not computed yet
+        loader = self.__dict__.get("_loaders", {}).get(name)
+        if loader is None:
+            raise AttributeError(name)
+        value = loader()
+        self.__dict__[name] = value
+        return value
+
+    def freeze(self) -> None:
+        # Computes the fields not read yet, before the game state changes
+        for name in GameInfo.FIELDS:
+            getattr(self, name)
+        self._loaders = {}
+
+    def __getstate__(self) -> dict:
+        # Sent to isolated bots with every field filled in
+        return {name: getattr(self, name) for name in GameInfo.FIELDS}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._loaders = {}
+
+    def __repr__(self) -> str:
+        return f"GameInfo({', '.join(f'{name}={getattr(self, name)!r}' for name in GameInfo.FIELDS)})"
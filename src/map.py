@@ -7,6 +7,32 @@ from os.path import isfile
 from src.info import RobotInfo, TileInfo
 from src.errors import *
 from src.map_validate import val_map_wrap
+from src.distance_table import DistanceTable, file_hash
+
+
+def indexes_to_bits(indexes) -> int:
+    bits = 0
+    for index in indexes:
+        bits |= 1 << index
+    return bits
+
+
+# Containers a forked Map shares with its parent until either writes to them, (attribute, team)
+SHARED_CONTAINERS = (("_terraform", None),) + tuple(
+    (name, team)
+    for name in ("_fog", "_frontier", "_visible_mines", "_ally_terraformed", "_empty_ally_terraformed", "_map_cache")
+    for team in (Team.RED, Team.BLUE)
+)
+
+
+def bits_to_indexes(bits: int) -> list[int]:
+    # Set bits, lowest first
+    indexes = []
+    while bits:
+        low = bits & -bits
+        indexes.append(low.bit_length() - 1)
+        bits ^= low
+    return indexes
 
 
 class Tile:
@@ -108,42 +134,147 @@ class Tile:
 
 
 class Map:
-    def __init__(self, path: str = None, radius = 1):
+    # Validated map files and their hashes, reused across games when cache=True
+    _file_cache = {}
+
+    # Distance tables shared by every Map of the same file, by file hash
+    _distance_tables = {}
+
+    # 3x3 area bit masks, shared by every Map of the same size
+    _area_mask_tables = {}
+
+    def __init__(self, path: str = None, radius = 1, cache = False):
         # Check Tiles Safety
         if isfile(path):
-            with open(path) as f:
-                normList = json.load(f)
-            val_map_wrap(normList)
-
-            self._tiles = MapReader.generateMap(normList,radius=radius)
+            if cache and path in Map._file_cache:
+                normList, fileHash = Map._file_cache[path]
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+                normList = json.loads(data)
+                fileHash = file_hash(data)
+                val_map_wrap(normList)
+                if cache: Map._file_cache[path] = (normList, fileHash)
+
+            tiles = MapReader.generateMap(normList,radius=radius)
         else:
-            self._tiles = MapReader.generateRandMap(GameConstants.MAX_MAP_HEIGHT,GameConstants.MAX_MAP_WIDTH, radius=radius)
-            MapReader.saveMap(self._tiles, path.split('/')[1].split(".")[0])            
+            tiles = MapReader.generateRandMap(GameConstants.MAX_MAP_HEIGHT,GameConstants.MAX_MAP_WIDTH, radius=radius)
+            MapReader.saveMap(tiles, path.split('/')[1].split(".")[0])            
+            fileHash = None
 
         # Store Variables
-        self._height = len(self._tiles)
-        self._width = len(self._tiles[0])
+        self._height = len(tiles)
+        self._width = len(tiles[0])
+        self._file_hash = fileHash
+        self._distance_table = None
+
+        # Flat Tile Storage, indexed by row * width + col
+        self._states = [tile.get_state() for tileRow in tiles for tile in tileRow]
+        self._terraform = [tile.get_terraform() for tileRow in tiles for tile in tileRow]
+        self._mining = [tile.get_mining() for tileRow in tiles for tile in tileRow]
+        self._fog = {
+            Team.RED: [tile.get_fog_of_war(Team.RED) for tileRow in tiles for tile in tileRow],
+            Team.BLUE: [tile.get_fog_of_war(Team.BLUE) for tileRow in tiles for tile in tileRow],
+        }
+        self._impassable = [state == TileState.IMPASSABLE for state in self._states]
+
+        # Row and column of every index
+        self._rows = [index // self._width for index in range(self._height * self._width)]
+        self._cols = [index % self._width for index in range(self._height * self._width)]
+
+        # Precomputed Neighbors, in Direction order, and 3x3 areas, in row-major order
+        self._neighbors = MapReader.neighborTable(self._height, self._width)
+        self._areas = [
+            [(row + addRow) * self._width + col + addCol
+                for addRow in range(-1, 2) for addCol in range(-1, 2)
+                if 0 <= row + addRow < self._height and 0 <= col + addCol < self._width]
+            for row in range(self._height) for col in range(self._width)
+        ]
 
         # Store All Initial Map Lists
+        self._terraformed_counts = {Team.RED: 0, Team.BLUE: 0}
         self.initial_map_passability = []
         self.initial_map_metal = []
         self.initial_map_terraformed = []
         self.initial_map_visible = []
-        for row in range(self._height):
-            for col in range(self._width):
-                tile = self._tiles[row][col]
-                # Add Map Config
-                if tile.get_state() == TileState.IMPASSABLE:
-                    self.initial_map_passability.append((row,col))
-                elif tile.get_state() == TileState.MINING:
-                    self.initial_map_metal.append((row,col,tile.get_mining()))
-                elif tile.get_terraform() != 0:
-                    self.initial_map_terraformed.append((row,col,tile.get_terraform()))
-                # Add Fog of War
-                if not tile.get_fog_of_war(Team.RED):
-                    self.initial_map_visible.append((row,col,1))
-                if not tile.get_fog_of_war(Team.BLUE):
-                    self.initial_map_visible.append((row,col,2))
+        for index in range(self._height * self._width):
+            row, col = divmod(index, self._width)
+            state, terraform = self._states[index], self._terraform[index]
+            # Add Map Config
+            if state == TileState.IMPASSABLE:
+                self.initial_map_passability.append((row,col))
+            elif state == TileState.MINING:
+                self.initial_map_metal.append((row,col,self._mining[index]))
+            elif terraform != 0:
+                self.initial_map_terraformed.append((row,col,terraform))
+                if terraform > 0: self._terraformed_counts[Team.BLUE] += 1
+                else: self._terraformed_counts[Team.RED] += 1
+            # Add Fog of War
+            if not self._fog[Team.RED][index]:
+                self.initial_map_visible.append((row,col,1))
+            if not self._fog[Team.BLUE][index]:
+                self.initial_map_visible.append((row,col,2))
+
+        # Robot Occupancy, index -> Robot
+        self._robot_positions = {}
+
+        # Bitboards, bit index set for fogged tiles, ally terraformed tiles and robots of each team
+        key = (self._height, self._width)
+        if key not in Map._area_mask_tables:
+            Map._area_mask_tables[key] = [indexes_to_bits(area) for area in self._areas]
+        self._area_masks = Map._area_mask_tables[key]
+        self._fog_bits = {team: indexes_to_bits(index for index, fogged in enumerate(self._fog[team]) if fogged)
+            for team in (Team.RED, Team.BLUE)}
+        self._robot_bits = {Team.RED: 0, Team.BLUE: 0}
+
+        # Per-team tile indexes, kept up to date by explore, terraform and robot moves
+        self._frontier = {team: self.build_frontier(team) for team in (Team.RED, Team.BLUE)}
+        self._visible_mines = {team: self.build_visible_mines(team) for team in (Team.RED, Team.BLUE)}
+        self._ally_terraformed = {team: self.build_ally_terraformed(team) for team in (Team.RED, Team.BLUE)}
+        self._empty_ally_terraformed = {team: set(self._ally_terraformed[team]) for team in (Team.RED, Team.BLUE)}
+        self._owned_bits = {team: indexes_to_bits(self._ally_terraformed[team]) for team in (Team.RED, Team.BLUE)}
+
+        # Bumped whenever fog or terraform ownership change, and whenever robots move
+        self._terrain_version = 0
+        self._robot_version = 0
+
+        # Per-team TileInfo grids, patched only where tiles changed
+        self._map_cache = {Team.RED: None, Team.BLUE: None}
+        self._dirty = {Team.RED: set(), Team.BLUE: set()}
+
+        # Keys of SHARED_CONTAINERS still shared with a fork
+        self._shared = set()
+
+    def fork(self) -> "Map":
+        """
+        Copy of the map for simulation. Small per-team values are copied, tile
+        arrays, tile indexes and TileInfo grids stay shared until the parent
+        or the fork first writes to them
+        """
+        child = copy.copy(self)
+        for name in ("_fog_bits", "_robot_bits", "_owned_bits", "_terraformed_counts", "_robot_positions",
+                "_fog", "_frontier", "_visible_mines", "_ally_terraformed", "_empty_ally_terraformed", "_map_cache"):
+            setattr(child, name, dict(getattr(self, name)))
+        child._dirty = {team: set(dirty) for team, dirty in self._dirty.items()}
+        self._shared = set(SHARED_CONTAINERS)
+        child._shared = set(SHARED_CONTAINERS)
+        return child
+
+    def _writable(self, name: str, team: Team = None):
+        # Copies a container shared with a fork before its first write
+        key = (name, team)
+        if team is None:
+            value = getattr(self, name)
+            if key in self._shared:
+                self._shared.discard(key)
+                value = copy.copy(value)
+                setattr(self, name, value)
+        else:
+            value = getattr(self, name)[team]
+            if key in self._shared:
+                self._shared.discard(key)
+                value = getattr(self, name)[team] = copy.copy(value)
+        return value
 
     def get_height(self) -> int:
         return self._height
@@ -151,27 +282,274 @@ class Map:
     def get_width(self) -> int:
         return self._width
 
+    def get_index(self, row: int, col: int) -> int:
+        return row * self._width + col
+
+    def in_bounds(self, row: int, col: int) -> bool:
+        return 0 <= row < self._height and 0 <= col < self._width
+
+    """ FLAT ARRAYS (read-only, indexed by get_index) """
+
+    def get_neighbors(self) -> list[list[tuple[Direction, int]]]:
+        return self._neighbors
+
+    def get_rows(self) -> list[int]:
+        return self._rows
+
+    def get_cols(self) -> list[int]:
+        return self._cols
+
+    def get_fog(self, team: Team) -> list[bool]:
+        return self._fog[team]
+
+    def get_impassable(self) -> list[bool]:
+        return self._impassable
+
+    def get_terraform_array(self) -> list[int]:
+        return self._terraform
+
+    def get_mining_array(self) -> list[int]:
+        return self._mining
+
+    def get_state_array(self) -> list[TileState]:
+        return self._states
+
+    def get_terrain_version(self) -> int:
+        return self._terrain_version
+
+    def get_robot_version(self) -> int:
+        return self._robot_version
+
+    def get_occupancy(self) -> dict:
+        return self._robot_positions
+
+    """ STATIC DISTANCES (ignoring fog and robots) """
+
+    def get_distance_table(self) -> DistanceTable:
+        if self._distance_table is None:
+            key = self._file_hash
+            table = Map._distance_tables.get(key) if key is not None else None
+            if table is None:
+                table = DistanceTable(self._height, self._width, self._impassable, self._neighbors, key)
+                if key is not None: Map._distance_tables[key] = table
+            self._distance_table = table
+        return self._distance_table
+
+    def get_static_distance(self, startRow: int, startCol: int, endRow: int, endCol: int) -> int:
+        """
+        Moves between two tiles through passable tiles, ignoring fog and robots
+        (-1 if there is no path). A lower bound on any fog-aware path
+        """
+        if not (self.in_bounds(startRow, startCol) and self.in_bounds(endRow, endCol)):
+            return -1
+        return self.get_distance_table().distance(startRow * self._width + startCol, endRow * self._width + endCol)
+
+    def precompute_static_distances(self) -> None:
+        # Every row at once, saved to disk for later games on this map
+        self.get_distance_table().compute_all()
+
+    """ BITBOARDS (bit row * width + col of a Python int) """
+
+    def get_fog_bits(self, team: Team) -> int:
+        return self._fog_bits[team]
+
+    def get_owned_bits(self, team: Team) -> int:
+        # Tiles terraformed by team
+        return self._owned_bits[team]
+
+    def get_robot_bits(self, team: Team) -> int:
+        return self._robot_bits[team]
+
+    def get_visible_count(self, team: Team) -> int:
+        return self._height * self._width - bin(self._fog_bits[team]).count("1")
+
+    """ TILE INDEXES (read-only sets of flat indices, per team) """
+
+    def get_frontier(self, team: Team) -> set[int]:
+        # Visible passable tiles next to fog
+        return self._frontier[team]
+
+    def get_visible_mines(self, team: Team) -> set[int]:
+        return self._visible_mines[team]
+
+    def get_ally_terraformed(self, team: Team) -> set[int]:
+        return self._ally_terraformed[team]
+
+    def get_empty_ally_terraformed(self, team: Team) -> set[int]:
+        return self._empty_ally_terraformed[team]
+
+    def is_frontier(self, index: int, team: Team) -> bool:
+        if self._fog[team][index] or self._impassable[index]:
+            return False
+        return (self._fog_bits[team] & self._area_masks[index]) != 0
+
+    def build_frontier(self, team: Team) -> set[int]:
+        return {index for index in range(self._height * self._width) if self.is_frontier(index, team)}
+
+    def build_visible_mines(self, team: Team) -> set[int]:
+        fog = self._fog[team]
+        return {index for index, state in enumerate(self._states) if state == TileState.MINING and not fog[index]}
+
+    def build_ally_terraformed(self, team: Team) -> set[int]:
+        sign = 1 if team == Team.BLUE else -1
+        return {index for index, value in enumerate(self._terraform) if value * sign > 0}
+
+    def update_explored(self, team: Team, exploredTiles: list[tuple[int, int]]) -> None:
+        mines = self._writable("_visible_mines", team)
+        for row, col in exploredTiles:
+            index = row * self._width + col
+            if self._states[index] == TileState.MINING:
+                mines.add(index)
+        self.update_frontier(team, exploredTiles)
+
+    def update_frontier(self, team: Team, changedTiles: list[tuple[int, int]]) -> None:
+        # Changed tiles and their neighbors may have gained or lost fog next to them
+        frontier = self._writable("_frontier", team)
+        affected = set()
+        for row, col in changedTiles:
+            index = row * self._width + col
+            affected.add(index)
+            affected.update(newIndex for _, newIndex in self._neighbors[index])
+        for index in affected:
+            if self.is_frontier(index, team):
+                frontier.add(index)
+            else:
+                frontier.discard(index)
+
+    def update_terraformed(self, index: int, prev: int, curr: int) -> None:
+        # Called when a tile changes owner
+        for team, value in ((Team.BLUE, prev), (Team.RED, -prev)):
+            if value > 0:
+                self._writable("_ally_terraformed", team).discard(index)
+                self._writable("_empty_ally_terraformed", team).discard(index)
+                self._owned_bits[team] &= ~(1 << index)
+        for team, value in ((Team.BLUE, curr), (Team.RED, -curr)):
+            if value > 0:
+                self._writable("_ally_terraformed", team).add(index)
+                self._owned_bits[team] |= 1 << index
+                if index not in self._robot_positions:
+                    self._writable("_empty_ally_terraformed", team).add(index)
+
+    def check_tile_indexes(self) -> None:
+        for team in (Team.RED, Team.BLUE):
+            ally = self.build_ally_terraformed(team)
+            expected = {
+                "frontier": (self.build_frontier(team), self._frontier[team]),
+                "visible mines": (self.build_visible_mines(team), self._visible_mines[team]),
+                "ally terraformed": (ally, self._ally_terraformed[team]),
+                "empty ally terraformed": (ally - self._robot_positions.keys(), self._empty_ally_terraformed[team]),
+            }
+            for name, (built, stored) in expected.items():
+                if built != stored:
+                    raise InvalidTileStateInternalError(f"Stale {name} index for {team}, missing:{built - stored} extra:{stored - built}")
+            bitboards = {
+                "fog": (indexes_to_bits(index for index, fogged in enumerate(self._fog[team]) if fogged), self._fog_bits[team]),
+                "ownership": (indexes_to_bits(ally), self._owned_bits[team]),
+                "robot": (indexes_to_bits(index for index, robot in self._robot_positions.items() if robot.get_team() == team),
+                    self._robot_bits[team]),
+            }
+            for name, (built, stored) in bitboards.items():
+                if built != stored:
+                    raise InvalidTileStateInternalError(f"Stale {name} bitboard for {team}")
+
+    """ ROBOT OCCUPANCY """
+
+    def mark_robot_dirty(self, robot) -> None:
+        """
+        Called when a robot's info changes without it moving (battery, action status)
+        """
+        row, col = robot.get_coord()
+        self.mark_dirty(row * self._width + col)
+
+    def get_robot_at(self, row: int, col: int):
+        return self._robot_positions.get(row * self._width + col)
+
+    def add_robot(self, robot) -> None:
+        row, col = robot.get_coord()
+        index = row * self._width + col
+        if index in self._robot_positions:
+            raise UnknownRobotInternalError(f"Tile already occupied {row, col} by {self._robot_positions[index].get_name()}")
+        self._robot_positions[index] = robot
+        self._robot_bits[robot.get_team()] |= 1 << index
+        self._robot_version += 1
+        for team in (Team.RED, Team.BLUE):
+            if index in self._empty_ally_terraformed[team]:
+                self._writable("_empty_ally_terraformed", team).discard(index)
+        self.mark_dirty(index)
+
+    def remove_robot(self, robot) -> None:
+        row, col = robot.get_coord()
+        index = row * self._width + col
+        if self._robot_positions.get(index) is not robot:
+            raise UnknownRobotInternalError(f"Robot {robot.get_name()} not found at {row, col}")
+        del self._robot_positions[index]
+        self._robot_bits[robot.get_team()] &= ~(1 << index)
+        self._robot_version += 1
+        if self._terraform[index] > 0: self._writable("_empty_ally_terraformed", Team.BLUE).add(index)
+        elif self._terraform[index] < 0: self._writable("_empty_ally_terraformed", Team.RED).add(index)
+        self.mark_dirty(index)
+
+    def replace_robot(self, robot, newRobot) -> None:
+        """
+        Puts newRobot, a copy of robot, in its place
+        """
+        row, col = robot.get_coord()
+        index = row * self._width + col
+        if self._robot_positions.get(index) is not robot:
+            raise UnknownRobotInternalError(f"Robot {robot.get_name()} not found at {row, col}")
+        self._robot_positions[index] = newRobot
+        self.mark_dirty(index)
+
+    """ TILES """
+
     def is_terraformed(self, team: Team, row: int, col: int) -> bool:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             return None
-        terraform = self._tiles[row][col].get_terraform()
+        terraform = self._terraform[row * self._width + col]
         if (team == Team.RED): return terraform < 0
         else: return terraform > 0
 
+    def get_terraformed_count(self, team: Team) -> int:
+        return self._terraformed_counts[team]
+
+    def recount_terraformed(self, team: Team) -> int:
+        """
+        Full scan of the map, used to check the incremental counts
+        """
+        if team == Team.RED:
+            return sum(1 for terraform in self._terraform if terraform < 0)
+        return sum(1 for terraform in self._terraform if terraform > 0)
+
+    def check_terraformed_counts(self) -> None:
+        for team in (Team.RED, Team.BLUE):
+            count = self.recount_terraformed(team)
+            if count != self._terraformed_counts[team]:
+                raise TerraformInternalError(f"Terraform count mismatch for {team}, counted:{count} stored:{self._terraformed_counts[team]}")
+
     def is_mineable(self, row: int, col: int) -> bool:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             return None
-        return self._tiles[row][col].get_state() == TileState.MINING
+        return self._states[row * self._width + col] == TileState.MINING
 
     def get_tile_state(self, row: int, col: int, team: Team) -> TileState:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             return TileState.ILLEGAL
-        if (self._tiles[row][col].is_fog_of_war(team)):
+        index = row * self._width + col
+        if (self._fog[team][index]):
             return TileState.ILLEGAL
-        return self._tiles[row][col].get_state()
+        return self._states[index]
 
     def get_terraform_status(self, row: int, col: int) -> int:
-        return self._tiles[row][col].get_terraform()
+        return self._terraform[row * self._width + col]
+
+    def is_fog_of_war(self, row: int, col: int, team: Team) -> bool:
+        return self._fog[team][row * self._width + col]
+
+    def has_fog_near(self, row: int, col: int, team: Team) -> bool:
+        """
+        Whether any tile in the 3x3 area around (row, col) is fogged for team
+        """
+        return (self._fog_bits[team] & self._area_masks[row * self._width + col]) != 0
 
     def terraform(self, row: int, col: int, team : Team) -> bool:
         """
@@ -185,13 +563,38 @@ class Map:
             raise TerraformInternalError(f"Illegal coordinate {row, col, team}")
 
         # Get Tile
-        tile = self._tiles[row][col]
-        tstate = tile.get_state()
+        index = row * self._width + col
+        tstate = self._states[index]
         if (tstate != TileState.TERRAFORMABLE):
             raise TerraformInternalError(f"Not a terraformable tile {row, col} {tstate}")
 
         # Terraform Tile
-        return tile.terraform(team)
+        prev = self._terraform[index]
+        if team == Team.BLUE:
+            if(prev >= GameConstants.TERRAFORM_MAX): return False
+            curr = prev + 1
+        else:
+            if(prev <= -GameConstants.TERRAFORM_MAX): return False
+            curr = prev - 1
+        self.set_terraform(index, curr)
+        return True
+
+    def set_terraform(self, index: int, curr: int) -> None:
+        """
+        Sets a tile's terraform value, keeping counts and indexes in step
+        """
+        prev = self._terraform[index]
+        self._writable("_terraform")[index] = curr
+        self.mark_dirty(index)
+
+        # Update counts when the tile crosses zero
+        if prev > 0: self._terraformed_counts[Team.BLUE] -= 1
+        elif prev < 0: self._terraformed_counts[Team.RED] -= 1
+        if curr > 0: self._terraformed_counts[Team.BLUE] += 1
+        elif curr < 0: self._terraformed_counts[Team.RED] += 1
+        if (prev > 0) != (curr > 0) or (prev < 0) != (curr < 0):
+            self._terrain_version += 1
+            self.update_terraformed(index, prev, curr)
 
     def explore(self, row: int, col: int, team : Team) -> list:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
@@ -202,23 +605,40 @@ class Map:
             raise ExploreInternalError(f"Illegal coordinate {row, col, team}")
 
         # Get Tile
-        tile = self._tiles[row][col]
-        tstate = tile.get_state()
-        if (tstate == TileState.IMPASSABLE):
+        index = row * self._width + col
+        if (self._impassable[index]):
             raise ExploreInternalError(f"Impassable tile {row, col}")
 
-
-        # Terraform Tile
+        # Explore Tiles, fogged bits of the 3x3 area in row-major order
+        explored = self._fog_bits[team] & self._area_masks[index]
+        self._fog_bits[team] ^= explored
+        fog = self._writable("_fog", team) if explored else self._fog[team]
         exploredTiles = []
-        for addRow in range(-1, 2):
-            for addCol in range(-1, 2):
-                newRow, newCol = row + addRow, col + addCol
-                if (0 <= newCol < self._width and 0 <= newRow < self._height):
-                    newtile = self._tiles[newRow][newCol]
-                    if(newtile.explore(team)):
-                        exploredTiles.append((newRow,newCol))
+        for newIndex in bits_to_indexes(explored):
+            fog[newIndex] = False
+            self._dirty[team].add(newIndex)
+            exploredTiles.append(divmod(newIndex, self._width))
+        if exploredTiles:
+            self._terrain_version += 1
+            self.update_explored(team, exploredTiles)
         return exploredTiles
 
+    def unexplore(self, team: Team, exploredTiles: list[tuple[int, int]]) -> None:
+        """
+        Puts fog back over tiles returned by explore, undoing it
+        """
+        if not exploredTiles:
+            return
+        fog, mines = self._writable("_fog", team), self._writable("_visible_mines", team)
+        for row, col in exploredTiles:
+            index = row * self._width + col
+            fog[index] = True
+            self._fog_bits[team] |= 1 << index
+            self._dirty[team].add(index)
+            mines.discard(index)
+        self._terrain_version += 1
+        self.update_frontier(team, exploredTiles)
+
     def mine(self, row: int, col: int, team : Team) -> list:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             raise MineInternalError(f"Tile not on map {row, col}")
@@ -229,36 +649,90 @@ class Map:
             raise MineInternalError(f"Illegal tile {row, col, team}")
 
         # Get Tile
-        tile = self._tiles[row][col]
-        if (tile.get_state() != TileState.MINING): return []
+        if (tstate != TileState.MINING): return []
         
         # Return Mining
-        return [tile.get_mining()]
+        return [self._mining[row * self._width + col]]
+
+    def get_tile_info(self, index: int, team: Team, with_robot: bool = True) -> TileInfo:
+        # Return none for fog of war
+        if self._fog[team][index]:
+            return None
+        row, col = divmod(index, self._width)
+        terraform = self._terraform[index]
+        if team == Team.RED:
+            terraform = -terraform
+        robot = self._robot_positions.get(index) if with_robot else None
+        return TileInfo(self._states[index], row, col, terraform, self._mining[index],
+            robot.info() if robot is not None else None)
+
+    def mark_dirty(self, index: int) -> None:
+        self._dirty[Team.RED].add(index)
+        self._dirty[Team.BLUE].add(index)
 
     def get_str_map(self, team: Team) -> list[list[str]]:
         retList = []
         for row in range(self._height):
             tileStr = []
             for col in range(self._width):
-                tileStr.append(self._tiles[row][col].string(team))
+                tileInfo = self.get_tile_info(row * self._width + col, team, with_robot=False)
+                if tileInfo == None:
+                    tileStr.append("#")
+                elif tileInfo.state == TileState.TERRAFORMABLE:
+                    tileStr.append(str(tileInfo.terraform))
+                elif tileInfo.state == TileState.MINING:
+                    tileStr.append("M")
+                elif tileInfo.state == TileState.IMPASSABLE:
+                    tileStr.append("I")
+                else:
+                    raise InvalidTileStateInternalError(f"{tileInfo.state}")
             retList.append(tileStr)
         return retList
 
+    def build_map(self, team: Team) -> list[list[TileInfo]]:
+        width = self._width
+        return [[self.get_tile_info(row * width + col, team) for col in range(width)] for row in range(self._height)]
+
     def get_map(self, team: Team) -> list[list[TileInfo]]:
-        retList = []
-        for row in range(self._height):
-            tileStr = []
-            for col in range(self._width):
-                tileStr.append(self._tiles[row][col].get_info(team))
-            retList.append(tileStr)
-        return retList
+        """
+        Team's view of the map, including robots, patched from the previous call
+        """
+        grid = self._map_cache[team]
+        dirty = self._dirty[team]
+        if grid is None:
+            grid = self._map_cache[team] = self.build_map(team)
+            self._shared.discard(("_map_cache", team))
+        elif dirty:
+            if ("_map_cache", team) in self._shared:
+                self._shared.discard(("_map_cache", team))
+                grid = self._map_cache[team] = [row.copy() for row in grid]
+            width = self._width
+            for index in dirty:
+                grid[index // width][index % width] = self.get_tile_info(index, team)
+        dirty.clear()
+        # TileInfo is frozen, so only the rows need copying
+        return [row.copy() for row in grid]
+
+    def check_map_cache(self) -> None:
+        for team in (Team.RED, Team.BLUE):
+            if self.get_map(team) != self.build_map(team):
+                raise InvalidTileStateInternalError(f"Cached map out of date for {team}")
 
     def __str__(self) -> str:
         retList = []
         for row in range(self._height):
             tileStr = []
             for col in range(self._width):
-                tileStr.append(self._tiles[row][col].__str__())
+                index = row * self._width + col
+                state = self._states[index]
+                if state == TileState.TERRAFORMABLE:
+                    tileStr.append(str(self._terraform[index]))
+                elif state == TileState.MINING:
+                    tileStr.append("M")
+                elif state == TileState.IMPASSABLE:
+                    tileStr.append("I")
+                else:
+                    raise InvalidTileStateInternalError(f"{state}")
             retList.append("\t".join(tileStr))
         return "\n".join(retList)
 
@@ -318,6 +792,22 @@ class MapReader:
         MapReader.visualizeBaseTiles(retTiles,radius=radius)
         return retTiles
 
+    @staticmethod
+    def neighborTable(height : int, width : int) -> list[list[tuple[Direction, int]]]:
+        """
+        In-bounds neighbors of every tile as (direction, index), in Direction order
+        """
+        table = []
+        for row in range(height):
+            for col in range(width):
+                neighbors = []
+                for newDir in Direction:
+                    newRow, newCol = row + newDir.value[0], col + newDir.value[1]
+                    if 0 <= newRow < height and 0 <= newCol < width:
+                        neighbors.append((newDir, newRow * width + newCol))
+                table.append(neighbors)
+        return table
+
     @staticmethod
     def visualizeBaseTiles(retTiles : list[list[Tile]], radius=1):
         # Use Height and Width
@@ -325,21 +815,21 @@ class MapReader:
         if(width <= 0 or height <= 0):
             print("0-dimension tiles given")
             raise EnvironmentError
+        neighbors = MapReader.neighborTable(height, width)
 
         # Explore Function
         def explore(row : int, col : int, team : Team) -> None:
-            visited = set()
-            queue = deque([(row, col, radius)])
-            visited.add((row,col))
+            start = row * width + col
+            visited = {start}
+            queue = deque([(start, radius)])
             while (queue):
-                queueRow, queueCol, depth = queue.popleft()
-                retTiles[queueRow][queueCol].explore(team)
+                index, depth = queue.popleft()
+                retTiles[index // width][index % width].explore(team)
                 if(depth == 0): continue
-                for newDir in Direction:
-                    newRow, newCol = queueRow + newDir.value[0], queueCol + newDir.value[1]
-                    if 0 <= newRow < height and 0 <= newCol < width and (newRow,newCol) not in visited:
-                        queue.append((newRow, newCol, depth-1))
-                        visited.add((newRow,newCol))
+                for _, newIndex in neighbors[index]:
+                    if newIndex not in visited:
+                        queue.append((newIndex, depth-1))
+                        visited.add(newIndex)
 
         # Now Explore
         for row in range(height):
@@ -0,0 +1,88 @@
+"""
+This file is responsible for turning a team's view of the game into
+NumPy planes for learning bots. NumPy is only needed once an observation
+is requested, the engine itself runs without it
+"""
+from src.game_constants import Team, RobotType
+import weakref
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Planes of an observation, in order
+OBSERVATION_PLANES = (
+    "passable",          # 1 on visible tiles robots can stand on
+    "mining",            # mining value of visible mines
+    "terraform",         # terraform value of visible tiles, positive is ally
+    "fog",               # 1 on tiles the team cannot see
+    "ally_explorer",     # 1 under each ally robot of that type
+    "ally_miner",
+    "ally_terraformer",
+    "ally_battery",      # battery of the ally robot on the tile
+    "enemy_robot",       # 1 under each visible enemy robot
+    "enemy_battery",     # battery of the visible enemy robot on the tile
+)
+PASSABLE, MINING, TERRAFORM, FOG, ALLY_EXPLORER, ALLY_MINER, ALLY_TERRAFORMER, \
+    ALLY_BATTERY, ENEMY_ROBOT, ENEMY_BATTERY = range(len(OBSERVATION_PLANES))
+
+ALLY_TYPE_PLANES = {
+    RobotType.EXPLORER: ALLY_EXPLORER,
+    RobotType.MINER: ALLY_MINER,
+    RobotType.TERRAFORMER: ALLY_TERRAFORMER,
+}
+
+# Planes that never change during a game, converted once per map
+_static_planes = weakref.WeakKeyDictionary()
+
+
+def _get_static_planes(map) -> tuple:
+    planes = _static_planes.get(map)
+    if planes is None:
+        planes = _static_planes[map] = (
+            ~np.array(map.get_impassable(), dtype=bool),
+            np.array(map.get_mining_array(), dtype=np.float32),
+        )
+    return planes
+
+
+def build_observation(map, team: Team, ally_robots: dict, enemy_robots: dict):
+    """
+    Stacks the team's planes into a float32 array of shape
+    (len(OBSERVATION_PLANES), height, width). Every plane is zero under fog
+    except the fog plane itself
+    """
+    if np is None:
+        raise ImportError("Observations require numpy, install it with: pip install numpy")
+
+    height, width = map.get_height(), map.get_width()
+    obs = np.zeros((len(OBSERVATION_PLANES), height * width), dtype=np.float32)
+
+    # Tile planes, converted straight from the map's flat arrays
+    passable, mining = _get_static_planes(map)
+    size = height * width
+    fogBits = map.get_fog_bits(team).to_bytes((size + 7) // 8, "little")
+    fog = np.unpackbits(np.frombuffer(fogBits, dtype=np.uint8), count=size, bitorder="little").view(bool)
+    obs[PASSABLE] = passable & ~fog
+    obs[MINING] = mining
+    obs[TERRAFORM] = np.array(map.get_terraform_array(), dtype=np.float32)
+    if team == Team.RED:
+        obs[TERRAFORM] *= -1
+    obs[MINING:TERRAFORM + 1, fog] = 0
+    obs[FOG] = fog
+
+    # Robot planes, one entry per robot
+    for robot in ally_robots.values():
+        row, col = robot.get_coord()
+        index = row * width + col
+        obs[ALLY_TYPE_PLANES[robot.get_type()], index] = 1
+        obs[ALLY_BATTERY, index] = robot.get_battery()
+    for robot in enemy_robots.values():
+        row, col = robot.get_coord()
+        index = row * width + col
+        if not fog[index]:
+            obs[ENEMY_ROBOT, index] = 1
+            obs[ENEMY_BATTERY, index] = robot.get_battery()
+
+    return obs.reshape(len(OBSERVATION_PLANES), height, width)
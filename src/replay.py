@@ -1,8 +1,13 @@
 from dataclasses import dataclass
 from src.robot import Robot
 from src.game_constants import RobotType, Team
+import copy
 import json
+import lzma
+import os
 import pathlib
+import struct
+import zlib
 
 
 @dataclass
@@ -16,6 +21,21 @@ class Turn:
     tiles_explored: list[tuple[int, int]]
     tiles_terraformed: list[tuple[int, int]]
     robot_changes: list[tuple[str, int, int, str, int]]
+    wall_time: float
+    cpu_time: float
+
+@dataclass
+class ReplayState:
+    """
+    Full board after a number of turns of a replay
+    """
+    turn_index: int
+    terraform: list[list[int]]
+    visible_red: list[list[bool]]
+    visible_blue: list[list[bool]]
+    robots: dict[str, tuple[int, int, str, int, str]]
+    red_metal: int
+    blue_metal: int
 
 @dataclass
 class ReplayMetadata:
@@ -29,6 +49,30 @@ class ReplayMetadata:
     winner: str
 
 
+# Streaming replay records
+STREAM_EXTENSION = "awap23rs"
+RECORD_HEADER = "header"
+RECORD_TURN = "turn"
+RECORD_FOOTER = "footer"
+
+# Binary replay format
+BINARY_EXTENSION = "awap23b"
+BINARY_MAGIC = b"AWAP23B"
+BINARY_VERSION = 2
+CODECS = {"zlib": (0, zlib.compress, zlib.decompress), "lzma": (1, lzma.compress, lzma.decompress)}
+TEAM_CODES = {"red": 1, "blue": 2}
+ROBOT_TYPE_CODES = {"e": 0, "m": 1, "t": 2}
+TURN_STRUCT = struct.Struct("<BHiiiBddd")
+TURN_STRUCT_V1 = struct.Struct("<BHiiiddd")
+# Turn times, after a byte of flags: per field, whether it was an int (-1 on
+# timeouts) and whether it was left out (wall and cpu time of older replays)
+TIME_FIELDS = ("time_left", "wall_time", "cpu_time")
+TIME_INT = 0x1
+TIME_MISSING = 0x8
+CHANGE_STRUCT = struct.Struct("<IBbbh")
+CHANGE_TERMINATED = 0x10
+
+
 class Replay:
     def __init__(
         self,
@@ -43,7 +87,11 @@ class Replay:
         initial_map_metal: list[tuple[int, int, int]],
         initial_map_terraformed: list[tuple[int, int, int]],
         initial_map_visible: list[tuple[int, int, int]],
+        stream: bool = False,
+        file_name: str = None,
     ):
+        # Saved as replays/<file_name>.<extension>, the game's name unless given
+        self.file_name = file_name if file_name is not None else game_name
         self.metadata = ReplayMetadata(
             game_name,
             map_name,
@@ -64,12 +112,53 @@ class Replay:
         self.terraformed_tiles = []
         self.robot_changes = []
 
+        # Streaming replays append each turn to disk instead of keeping it
+        self.stream_file = None
+        if stream:
+            self.open_stream()
+
+    def open_stream(self) -> None:
+        # create replay folder if needed
+        path = pathlib.Path("replays/")
+        path.mkdir(parents=True, exist_ok=True)
+
+        # Header record holds everything known before the first turn
+        header = dict(self.metadata.__dict__)
+        header['initial_map_passability'] = self.initial_map_passability
+        header['initial_map_metal'] = self.initial_map_metal
+        header['initial_map_terraformed'] = self.initial_map_terraformed
+        header['initial_map_visible'] = self.initial_map_visible
+        self.stream_file = open(f"replays/{self.file_name}.{STREAM_EXTENSION}", "w")
+        self.write_record(RECORD_HEADER, header)
+
+    def write_record(self, record_type: str, data: dict) -> None:
+        # One record per line, flushed so a crashed game keeps every finished turn
+        self.stream_file.write(json.dumps([record_type, data], separators=(',', ':')) + "\n")
+        self.stream_file.flush()
+
+    def close(self) -> None:
+        """
+        Closes a streaming replay, without a footer if the game did not finish
+        """
+        if self.stream_file is not None:
+            self.stream_file.close()
+            self.stream_file = None
+
     def add_explored_tiles(self, tiles: list[tuple[int, int]]) -> None:
         self.explored_tiles.extend(tiles)
 
     def add_terraformed_tiles(self, tiles: list[tuple[int, int]]) -> None:
         self.terraformed_tiles.extend(tiles)
 
+    def mark(self) -> tuple[int, int, int]:
+        # Lengths of the current turn's changes, see discard_since
+        return (len(self.explored_tiles), len(self.terraformed_tiles), len(self.robot_changes))
+
+    def discard_since(self, mark: tuple[int, int, int]) -> None:
+        del self.explored_tiles[mark[0]:]
+        del self.terraformed_tiles[mark[1]:]
+        del self.robot_changes[mark[2]:]
+
     def add_robot_changes(self, robot: Robot, terminate: bool) -> None:
         # Add Robot to Replay File and return
         entry = []
@@ -97,7 +186,7 @@ class Replay:
             entry.append("blue")
         self.robot_changes.append(tuple(entry))
 
-    def addTurn(self, team: str, time_left : float, num_robots : int, num_terr : int, turn_number: int, metal: int, timeout = False):
+    def addTurn(self, team: str, time_left : float, num_robots : int, num_terr : int, turn_number: int, metal: int, timeout = False, wall_time = -1, cpu_time = -1):
         # If timeout, than add turn while ignoring tiles
         if timeout:
             turn = Turn(
@@ -109,9 +198,11 @@ class Replay:
                 time_left,
                 [],
                 [],
-                []
+                [],
+                wall_time,
+                cpu_time
             )
-            self.turns.append(turn)
+            self.record_turn(turn)
             return
         # Add Turn
         turn = Turn(
@@ -123,18 +214,35 @@ class Replay:
             time_left,
             self.explored_tiles,
             self.terraformed_tiles,
-            self.robot_changes
+            self.robot_changes,
+            wall_time,
+            cpu_time
         )
-        self.turns.append(turn)
+        self.record_turn(turn)
         # Empty Lists
         self.explored_tiles = []
         self.terraformed_tiles = []
         self.robot_changes = []
 
+    def record_turn(self, turn: Turn) -> None:
+        if self.stream_file is not None:
+            self.write_record(RECORD_TURN, turn.__dict__)
+        else:
+            self.turns.append(turn)
+
     def setWinner(self, team: str):
         self.metadata.winner = team
 
     def write_json(self, print_reply):
+        # Finish Streaming Replay with a footer
+        if self.stream_file is not None:
+            self.write_record(RECORD_FOOTER, self.metadata.__dict__)
+            path = self.stream_file.name
+            self.close()
+            if print_reply:
+                return json.dumps(Replay.read_stream(path), separators=(',', ':'))
+            return path
+
         # Get Metadata
         retDict = self.metadata.__dict__
         # Add Lists of Initial Information
@@ -153,6 +261,333 @@ class Replay:
             path.mkdir(parents=True, exist_ok=True)
 
             # write the actual file
-            with open(f"replays/{self.metadata.game_name}.awap23r", "w") as outfile:
+            with open(f"replays/{self.file_name}.awap23r", "w") as outfile:
                 outfile.write(retJson)
         return retJson
+
+    def write_binary(self, codec: str = "lzma") -> str:
+        # Build the same layout as write_json
+        retDict = dict(self.metadata.__dict__)
+        retDict['initial_map_passability'] = self.initial_map_passability
+        retDict['initial_map_metal'] = self.initial_map_metal
+        retDict['initial_map_terraformed'] = self.initial_map_terraformed
+        retDict['initial_map_visible'] = self.initial_map_visible
+        retDict['turns'] = [i.__dict__ for i in self.turns]
+
+        # create replay folder if needed
+        path = pathlib.Path("replays/")
+        path.mkdir(parents=True, exist_ok=True)
+
+        # write the actual file
+        fileName = f"replays/{self.file_name}.{BINARY_EXTENSION}"
+        with open(fileName, "wb") as outfile:
+            outfile.write(encode_binary(retDict, codec))
+        return fileName
+
+    @staticmethod
+    def read_stream(path: str) -> dict:
+        """
+        Reads a streaming replay into the same layout as write_json.
+        A replay cut short by a crash has every finished turn and no winner
+        """
+        retDict = None
+        turns = []
+        with open(path) as infile:
+            for line in infile:
+                try:
+                    record_type, data = json.loads(line)
+                except ValueError:
+                    # Partially written last record
+                    break
+                if record_type == RECORD_HEADER:
+                    retDict = data
+                elif record_type == RECORD_TURN:
+                    turns.append(data)
+                elif record_type == RECORD_FOOTER:
+                    retDict.update(data)
+        if retDict is None:
+            raise ValueError(f"Streaming replay has no header {path}")
+        retDict['turns'] = turns
+        return retDict
+
+
+def _pack(fmt: str, rows: list) -> bytes:
+    # Count followed by fixed-width rows
+    flat = [value for row in rows for value in row]
+    return struct.pack(f"<I{fmt * len(rows)}", len(rows), *flat)
+
+
+def _unpack(fmt: str, data: bytes, offset: int) -> tuple[list, int]:
+    (count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    flat = struct.unpack_from(f"<{fmt * count}", data, offset)
+    offset += struct.calcsize(f"<{fmt * count}")
+    width = len(fmt)
+    return [list(flat[i:i + width]) for i in range(0, len(flat), width)], offset
+
+
+def encode_binary(replay: dict, codec: str = "lzma") -> bytes:
+    """
+    Encodes a replay dict (the write_json layout) as a compressed binary replay.
+    Robot names are interned to ids, and robot positions and batteries are
+    stored as deltas from the robot's previous entry
+    """
+    codec_id, compress, _ = CODECS[codec]
+    robot_ids = {}
+    last_state = {}
+
+    turns = []
+    for turn in replay['turns']:
+        changes = []
+        for name, row, col, type, battery, team in turn['robot_changes']:
+            robot_id = robot_ids.setdefault(name, len(robot_ids))
+            last_row, last_col, last_battery = last_state.get(robot_id, (0, 0, 0))
+            flags = ROBOT_TYPE_CODES[type] | TEAM_CODES[team] << 2
+            if row == -1 and col == -1:
+                flags |= CHANGE_TERMINATED
+                row, col = last_row, last_col
+            changes.append((robot_id, flags, row - last_row, col - last_col, battery - last_battery))
+            last_state[robot_id] = (row, col, battery)
+        time_flags, times = 0, []
+        for i, key in enumerate(TIME_FIELDS):
+            value = turn.get(key)
+            if value is None:
+                time_flags |= TIME_MISSING << i
+                value = -1
+            elif isinstance(value, int):
+                time_flags |= TIME_INT << i
+            times.append(value)
+        turns.append(b"".join([
+            TURN_STRUCT.pack(TEAM_CODES[turn['team']], turn['turn_number'], turn['metal'],
+                turn['num_robots'], turn['num_terr'], time_flags, *times),
+            _pack("BB", turn['tiles_explored']),
+            _pack("BB", turn['tiles_terraformed']),
+            struct.pack("<I", len(changes)),
+            b"".join(CHANGE_STRUCT.pack(*change) for change in changes),
+        ]))
+
+    # Scalar fields and the robot name table are stored as a small JSON header
+    header = {key: value for key, value in replay.items() if not key.startswith('initial_map') and key != 'turns'}
+    header['robot_names'] = list(robot_ids)
+    header = json.dumps(header, separators=(',', ':')).encode()
+
+    payload = b"".join([
+        struct.pack("<I", len(header)), header,
+        _pack("BB", replay['initial_map_passability']),
+        _pack("BBB", replay['initial_map_metal']),
+        _pack("BBb", replay['initial_map_terraformed']),
+        _pack("BBB", replay['initial_map_visible']),
+        struct.pack("<I", len(turns)),
+    ] + turns)
+    return BINARY_MAGIC + bytes([BINARY_VERSION, codec_id]) + compress(payload)
+
+
+def decode_binary(data: bytes) -> dict:
+    """
+    Decodes a binary replay back into the write_json layout
+    """
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("Not a binary replay")
+    version, codec_id = data[len(BINARY_MAGIC)], data[len(BINARY_MAGIC) + 1]
+    if version not in (1, BINARY_VERSION):
+        raise ValueError(f"Unsupported binary replay version {version}")
+    decompress = next(codec[2] for codec in CODECS.values() if codec[0] == codec_id)
+    payload = decompress(data[len(BINARY_MAGIC) + 2:])
+
+    # Header
+    (length,) = struct.unpack_from("<I", payload, 0)
+    retDict = json.loads(payload[4:4 + length])
+    robot_names = retDict.pop('robot_names')
+    offset = 4 + length
+
+    # Initial Map Lists
+    retDict['initial_map_passability'], offset = _unpack("BB", payload, offset)
+    retDict['initial_map_metal'], offset = _unpack("BBB", payload, offset)
+    retDict['initial_map_terraformed'], offset = _unpack("BBb", payload, offset)
+    retDict['initial_map_visible'], offset = _unpack("BBB", payload, offset)
+
+    # Turns
+    teams = {code: team for team, code in TEAM_CODES.items()}
+    types = {code: type for type, code in ROBOT_TYPE_CODES.items()}
+    last_state = {}
+    (num_turns,) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    turns = []
+    for _ in range(num_turns):
+        if version == 1:
+            team, turn_number, metal, num_robots, num_terr, *times = TURN_STRUCT_V1.unpack_from(payload, offset)
+            time_flags = 0
+            offset += TURN_STRUCT_V1.size
+        else:
+            team, turn_number, metal, num_robots, num_terr, time_flags, *times = TURN_STRUCT.unpack_from(payload, offset)
+            offset += TURN_STRUCT.size
+        times = {key: int(value) if time_flags & TIME_INT << i else value
+            for i, (key, value) in enumerate(zip(TIME_FIELDS, times)) if not time_flags & TIME_MISSING << i}
+        explored, offset = _unpack("BB", payload, offset)
+        terraformed, offset = _unpack("BB", payload, offset)
+        (num_changes,) = struct.unpack_from("<I", payload, offset)
+        offset += 4
+        changes = []
+        for _ in range(num_changes):
+            robot_id, flags, d_row, d_col, d_battery = CHANGE_STRUCT.unpack_from(payload, offset)
+            offset += CHANGE_STRUCT.size
+            last_row, last_col, last_battery = last_state.get(robot_id, (0, 0, 0))
+            row, col, battery = last_row + d_row, last_col + d_col, last_battery + d_battery
+            last_state[robot_id] = (row, col, battery)
+            if flags & CHANGE_TERMINATED:
+                row, col = -1, -1
+            changes.append([robot_names[robot_id], row, col, types[flags & 0x3], battery, teams[flags >> 2 & 0x3]])
+        turn = {
+            'team': teams[team],
+            'turn_number': turn_number,
+            'metal': metal,
+            'num_robots': num_robots,
+            'num_terr': num_terr,
+            'time_left': times['time_left'],
+            'tiles_explored': explored,
+            'tiles_terraformed': terraformed,
+            'robot_changes': changes,
+        }
+        turn.update((key, times[key]) for key in ("wall_time", "cpu_time") if key in times)
+        turns.append(turn)
+    retDict['turns'] = turns
+    return retDict
+
+
+def json_to_binary(json_path: str, binary_path: str, codec: str = "lzma") -> None:
+    with open(json_path) as infile:
+        replay = json.load(infile)
+    with open(binary_path, "wb") as outfile:
+        outfile.write(encode_binary(replay, codec))
+
+
+def binary_to_json(binary_path: str, json_path: str) -> None:
+    with open(binary_path, "rb") as infile:
+        replay = decode_binary(infile.read())
+    with open(json_path, "w") as outfile:
+        outfile.write(json.dumps(replay, separators=(',', ':')))
+
+
+def load_replay(path: str) -> dict:
+    """
+    Loads a JSON, streaming or binary replay into the write_json layout
+    """
+    if path.endswith(f".{BINARY_EXTENSION}"):
+        with open(path, "rb") as infile:
+            return decode_binary(infile.read())
+    if path.endswith(f".{STREAM_EXTENSION}"):
+        return Replay.read_stream(path)
+    with open(path) as infile:
+        return json.load(infile)
+
+
+class ReplayReader:
+    """
+    Random access to the board at any turn of a replay.
+
+    Every keyframe_interval turns a full copy of the board is kept, so the
+    state after turn N is the nearest earlier keyframe plus at most
+    keyframe_interval - 1 turns applied. Keyframes are cached on disk next
+    to the replay and reused while the replay file is unchanged
+    """
+    CACHE_EXTENSION = "keyframes"
+
+    def __init__(self, path: str, keyframe_interval: int = 20, cache: bool = True):
+        if keyframe_interval < 1:
+            raise ValueError(f"Keyframe interval must be positive, received {keyframe_interval}")
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.replay = load_replay(path)
+        self.turns = self.replay['turns']
+        self.height = self.replay['map_height']
+        self.width = self.replay['map_width']
+
+        # Load or build keyframes
+        self.cache_path = f"{path}.{ReplayReader.CACHE_EXTENSION}"
+        self.keyframes = self.read_cache() if cache else None
+        if self.keyframes is None:
+            self.keyframes = self.build_keyframes()
+            if cache:
+                self.write_cache()
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def initial_state(self) -> ReplayState:
+        terraform = [[0] * self.width for _ in range(self.height)]
+        for row, col, value in self.replay['initial_map_terraformed']:
+            terraform[row][col] = value
+        visible_red = [[False] * self.width for _ in range(self.height)]
+        visible_blue = [[False] * self.width for _ in range(self.height)]
+        for row, col, team in self.replay['initial_map_visible']:
+            if team == Team.RED.value:
+                visible_red[row][col] = True
+            else:
+                visible_blue[row][col] = True
+        initial_metal = self.replay['initial_metal']
+        return ReplayState(0, terraform, visible_red, visible_blue, {}, initial_metal, initial_metal)
+
+    @staticmethod
+    def apply_turn(state: ReplayState, turn: dict) -> None:
+        # Timed out turns have no changes
+        if turn['metal'] != -1:
+            if turn['team'] == "red":
+                state.red_metal = turn['metal']
+            else:
+                state.blue_metal = turn['metal']
+        change = 1 if turn['team'] == "blue" else -1
+        for row, col in turn['tiles_terraformed']:
+            state.terraform[row][col] += change
+        visible = state.visible_blue if turn['team'] == "blue" else state.visible_red
+        for row, col in turn['tiles_explored']:
+            visible[row][col] = True
+        for name, row, col, type, battery, team in turn['robot_changes']:
+            if row == -1:
+                state.robots.pop(name, None)
+            else:
+                state.robots[name] = (row, col, type, battery, team)
+        state.turn_index += 1
+
+    def build_keyframes(self) -> list[ReplayState]:
+        state = self.initial_state()
+        keyframes = [copy.deepcopy(state)]
+        for index, turn in enumerate(self.turns):
+            ReplayReader.apply_turn(state, turn)
+            if (index + 1) % self.keyframe_interval == 0:
+                keyframes.append(copy.deepcopy(state))
+        return keyframes
+
+    def state_at(self, turn_index: int) -> ReplayState:
+        """
+        Board after the first turn_index turns (0 is the initial board)
+        """
+        if not (0 <= turn_index <= len(self.turns)):
+            raise IndexError(f"Turn {turn_index} out of range 0..{len(self.turns)}")
+        state = copy.deepcopy(self.keyframes[turn_index // self.keyframe_interval])
+        for turn in self.turns[state.turn_index:turn_index]:
+            ReplayReader.apply_turn(state, turn)
+        return state
+
+    def cache_key(self) -> list:
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns, self.keyframe_interval]
+
+    def read_cache(self) -> list[ReplayState]:
+        try:
+            with open(self.cache_path, "rb") as infile:
+                cached = json.loads(zlib.decompress(infile.read()))
+        except (OSError, ValueError, zlib.error):
+            return None
+        if cached['key'] != self.cache_key():
+            return None
+        return [ReplayState(**{**keyframe, 'robots': {name: tuple(robot) for name, robot in keyframe['robots'].items()}})
+            for keyframe in cached['keyframes']]
+
+    def write_cache(self) -> None:
+        cached = {'key': self.cache_key(), 'keyframes': [keyframe.__dict__ for keyframe in self.keyframes]}
+        try:
+            with open(self.cache_path, "wb") as outfile:
+                outfile.write(zlib.compress(json.dumps(cached, separators=(',', ':')).encode()))
+        except OSError:
+            # Read-only replay folders just don't get a cache
+            pass
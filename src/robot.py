@@ -2,6 +2,7 @@ from src.game_constants import Direction, GameConstants, RobotType, TileState, T
 from src.map import Map
 from src.info import RobotInfo
 from dataclasses import dataclass
+import copy
 
 from src.errors import *
 
@@ -10,6 +11,9 @@ class Robot:
     # Static Variable
     counter = 1
 
+    __slots__ = ("_name", "_type", "_row", "_col", "_team", "_moved", "_acted", "_height", "_width",
+                 "_battery", "_action_cost", "_shared", "_info")
+
     # Initial
     def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
         self._name = f"robot_{self.count()}"
@@ -24,6 +28,8 @@ class Robot:
         self._width = width
         self._battery = GameConstants.INIT_BATTERY
         self._action_cost = action_cost
+        self._shared = False
+        self._info = None
 
     @staticmethod
     def increment():
@@ -50,19 +56,45 @@ class Robot:
 
     def set_battery(self, battery) -> None:
         self._battery = battery
+        self._info = None
 
     def charge(self, charge: int) -> bool:
         if self._battery >= GameConstants.INIT_BATTERY:
             return False
         self._battery += charge
         self._battery = min(self._battery, GameConstants.INIT_BATTERY)
+        self._info = None
         return True
 
+    def share(self) -> None:
+        # Held by forked GameStates, which copy it before changing it
+        self._shared = True
+
+    def is_shared(self) -> bool:
+        return self._shared
+
+    def copy(self) -> "Robot":
+        newRobot = copy.copy(self)
+        newRobot._shared = False
+        return newRobot
+
+    def get_state(self) -> tuple:
+        # Everything an action can change, for undoing it
+        return (self._row, self._col, self._battery, self._moved, self._acted)
+
+    def set_state(self, state: tuple) -> None:
+        self._row, self._col, self._battery, self._moved, self._acted = state
+        self._info = None
+
     def reset_move_status(self) -> None:
-        self._moved = False
+        if self._moved:
+            self._moved = False
+            self._info = None
 
     def reset_acted_status(self) -> None:
-        self._acted = False
+        if self._acted:
+            self._acted = False
+            self._info = None
 
     def make_move(self, move: Direction) -> bool:
         # Check Valid Move
@@ -79,14 +111,28 @@ class Robot:
         self._moved = True
         self._row = newRow
         self._col = newCol
+        self._info = None
         return True
 
     def take_action(self, map: Map) -> list:
-        raise Exception("take_action abstract method")
+        self.assert_can_take_action(map)
+        return self.act(map)
+
+    def act(self, map: Map) -> list:
+        """
+        Takes the action, which must already have been checked
+        """
+        raise Exception("act abstract method")
 
     def assert_can_take_action(self, map: Map):
         raise Exception("assert_can_take_action abstract method")
 
+    def spend_action(self) -> None:
+        # Battery and action status of a checked action
+        self._acted = True
+        self._battery -= self._action_cost
+        self._info = None
+
     def assert_ready_to_act(self):
         if (self._acted):
             raise IllegalActionError(f"{self._name} {self._row, self._col} has already acted")
@@ -94,23 +140,28 @@ class Robot:
             raise IllegalActionError(f"{self._name} {self._row, self._col} has {self._battery}, needs {self._action_cost} battery")
 
     def info(self) -> RobotInfo:
-        return RobotInfo(
-            self._battery,
-            self._acted,
-            self._moved,
-            self._action_cost, 
-            self._row,
-            self._col, 
-            self._team,
-            self._name, 
-            self._type
-        )
+        # Built once and shared until the robot changes, RobotInfo is frozen
+        if self._info is None:
+            self._info = RobotInfo(
+                self._battery,
+                self._acted,
+                self._moved,
+                self._action_cost, 
+                self._row,
+                self._col, 
+                self._team,
+                self._name, 
+                self._type
+            )
+        return self._info
 
     def __str__(self) -> str:
         return f"{self._name} - ({self._row},{self._col}), {self._team}, B:{self._battery}"
 
 
 class Miner_Robot(Robot):
+    __slots__ = ()
+
     def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
         Robot.__init__(self, row, col, team, height, width, action_cost)
         self._type = RobotType.MINER
@@ -126,16 +177,15 @@ class Miner_Robot(Robot):
         return 
 
 
-    def take_action(self, map: Map) -> list:
-        self.assert_can_take_action(map)
-
+    def act(self, map: Map) -> list:
         # Update Battery and Give Output
-        self._acted = True
-        self._battery -= self._action_cost
+        self.spend_action()
         return map.mine(self._row, self._col, self._team)
 
 
 class Terraformer_Robot(Robot):
+    __slots__ = ()
+
     def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
         Robot.__init__(self, row, col, team, height, width, action_cost)
         self._type = RobotType.TERRAFORMER
@@ -148,7 +198,7 @@ class Terraformer_Robot(Robot):
         if (map.get_tile_state(self._row, self._col, self._team) != TileState.TERRAFORMABLE):
             raise IllegalActionError(f"Tried to terraform a non-terraformable tile at {self._row, self._col}")
 
-        new_val = map._tiles[self._row][self._col].get_terraform()
+        new_val = map.get_terraform_status(self._row, self._col)
         if self._team == Team.BLUE:
             new_val += 1
         else:
@@ -159,15 +209,12 @@ class Terraformer_Robot(Robot):
 
 
 
-    def take_action(self, map: Map) -> list:
-        self.assert_can_take_action(map)
-
+    def act(self, map: Map) -> list:
         # Update Battery and Give Output
-        self._acted = True
-        self._battery -= self._action_cost
+        self.spend_action()
         map.terraform(self._row, self._col, self._team)
 
-        v = map._tiles[self._row][self._col].get_terraform()
+        v = map.get_terraform_status(self._row, self._col)
         if not (-GameConstants.TERRAFORM_MAX <= v <= GameConstants.TERRAFORM_MAX):
             raise Exception(f"bad {v} at {self._row, self._col}")
 
@@ -175,6 +222,8 @@ class Terraformer_Robot(Robot):
 
 
 class Explorer_Robot(Robot):
+    __slots__ = ()
+
     def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
         Robot.__init__(self, row, col, team, height, width, action_cost)
         self._type = RobotType.EXPLORER
@@ -184,32 +233,18 @@ class Explorer_Robot(Robot):
     def assert_can_take_action(self, map: Map):
         self.assert_ready_to_act()
 
-        def is_fog(x, y):
-            return map._tiles[x][y].is_fog_of_war(self._team)
-
-        has_fog = False
-        for dx in range(-1, 2):
-            for dy in range(-1, 2):
-                nx, ny = self._row + dx, self._col + dy
-                if 0 <= nx < map.get_height() and 0 <= ny < map.get_width():
-                    if is_fog(nx, ny):
-                        has_fog = True
-
-        if not has_fog:
+        if not map.has_fog_near(self._row, self._col, self._team):
             raise IllegalActionError(f"Tried to explore, but no nearby tiles have fog at {self._row, self._col}")
 
 
 
-    def take_action(self, map: Map) -> list:
-        self.assert_can_take_action(map)
-
+    def act(self, map: Map) -> list:
         # don't really need this check
         # if (map.get_tile_state(self._row, self._col, self._team) == TileState.IMPASSABLE):
         #     raise InvalidActionInternalError(f"Robot is on impassable tile {self._row, self._col}")
 
         # Update Battery and Give Output
-        self._acted = True
-        self._battery -= self._action_cost
+        self.spend_action()
 
         tiles = map.explore(self._row, self._col, self._team)
         return tiles
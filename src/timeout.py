@@ -1,9 +1,234 @@
+"""
+This file is responsible for running bots in their own worker process,
+so a bot that runs over its time can be killed and restarted
+"""
+from src.game_constants import Team, GameConstants
+from src.errors import InvalidBotFileError
 import multiprocessing
+import importlib.util
+import pickle
+import traceback
+import signal
+import math
+import os
+import sys
+import time
 
-if __name__ == "__main__":
-    p = multiprocessing.Process(target=player.play_turn, name="run_player")
-    p.start()
-    p.join(GameConstants.TIME_LIMIT)
-    if p.is_alive():
-        p.terminate()
-    raise ValueError
\ No newline at end of file
+# cpu limits and rusage are only available on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Message Types
+MSG_TURN = 0
+MSG_CALL = 1
+MSG_RESULT = 2
+MSG_ERROR = 3
+MSG_DONE = 4
+MSG_READY = 5
+MSG_EXIT = 6
+
+# Signal sent by the kernel when a worker runs out of cpu time
+CPU_LIMIT_SIGNAL = getattr(signal, "SIGXCPU", None)
+
+
+class GameStateProxy:
+    """
+    Stands in for the GameState inside a worker, forwarding every
+    method call to the engine process
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            self._conn.send((MSG_CALL, name, args, kwargs))
+            msg_type, value = self._conn.recv()
+            if msg_type == MSG_ERROR:
+                raise value
+            return value
+        return call
+
+
+def _cpu_time() -> float:
+    if resource is None:
+        return time.process_time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _limit_cpu_time(seconds: float) -> None:
+    # The kernel sends SIGXCPU once the process has used this much cpu time
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _bot_worker(conn, module_name: str, file_path: str, team: Team, silence: bool):
+    # Silence for the lifetime of the worker
+    if silence:
+        sys.stdout = open(os.devnull, "w")
+
+    # No core dump when killed for running out of cpu time
+    if resource is not None:
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    # Import Bot
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, file_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        player = module.BotPlayer(team)
+    except Exception as e:
+        conn.send((MSG_ERROR, _picklable(e)))
+        return
+    conn.send((MSG_READY, None))
+
+    # Play turns until told to exit
+    game_state = GameStateProxy(conn)
+    while True:
+        msg_type, cpu_limit = conn.recv()
+        if msg_type == MSG_EXIT:
+            return
+        start = _cpu_time()
+        if cpu_limit is not None:
+            _limit_cpu_time(start + cpu_limit)
+        try:
+            player.play_turn(game_state)
+        except Exception:
+            traceback.print_exc()
+        conn.send((MSG_DONE, _cpu_time() - start))
+
+
+def _picklable(e: Exception) -> Exception:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+class ProcessPlayer:
+    """
+    Runs a bot in a persistent worker process. The worker is killed when a
+    turn overruns its time and restarted the next time it is needed
+    """
+
+    def __init__(self, team: Team, module_name: str, file_path: str, silence: bool):
+        self.team = team
+        self._module_name = module_name
+        self._file_path = file_path
+        self._silence = silence
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self.start()
+
+    def start(self) -> None:
+        self._conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_bot_worker,
+            args=(child_conn, self._module_name, self._file_path, self.team, self._silence),
+            name=f"bot_{self.team.name.lower()}",
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+        # Wait for bot import
+        try:
+            msg_type, value = self._conn.recv()
+        except EOFError:
+            self.kill()
+            raise InvalidBotFileError(f"Bot worker exited during startup {self._file_path}")
+        if msg_type == MSG_ERROR:
+            self.kill()
+            raise value
+
+    def kill(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def restart(self) -> None:
+        self.kill()
+        self.start()
+
+    def close(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send((MSG_EXIT, None))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(1)
+        self.kill()
+
+    def play_turn(self, game_state, time_left: float, cpu_clock: bool = False, wall_limit: float = None) -> tuple[bool, float]:
+        """
+        Plays one turn, serving the worker's GameState calls until it is done.
+        Returns whether the worker finished in time (it is killed otherwise) and
+        the cpu time of the turn, including the engine's time serving its calls.
+        A worker that crashes before reporting it is charged the wall time of the
+        turn instead, the cpu time is -1 only when the turn timed out. With a cpu
+        clock the turn is also cut off after wall_limit seconds of wall time
+        (CPU_CLOCK_WALL_FACTOR times time_left unless given)
+        """
+        if self._process is None or not self._process.is_alive():
+            self.restart()
+
+        # With a cpu clock the kernel enforces the limit, wall time is only a cap
+        turn_start = time.time()
+        if cpu_clock:
+            if wall_limit is None:
+                wall_limit = time_left * GameConstants.CPU_CLOCK_WALL_FACTOR
+            deadline = turn_start + wall_limit
+            self._conn.send((MSG_TURN, time_left))
+        else:
+            deadline = turn_start + time_left
+            self._conn.send((MSG_TURN, None))
+
+        serve_time = 0
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self._conn.poll(remaining):
+                self.kill()
+                return (False, -1)
+            try:
+                msg = self._conn.recv()
+            except EOFError:
+                # Worker died mid-turn, either out of cpu time or crashed
+                # (in which case it is restarted next turn)
+                self._process.join(1)
+                out_of_time = self._process.exitcode == -CPU_LIMIT_SIGNAL
+                self.kill()
+                if out_of_time:
+                    return (False, -1)
+                return (True, time.time() - turn_start)
+            if msg[0] == MSG_DONE:
+                return (True, msg[1] + serve_time)
+            start = time.thread_time()
+            reply = self._serve(game_state, *msg[1:])
+            serve_time += time.thread_time() - start
+            self._conn.send(reply)
+
+    def _serve(self, game_state, name: str, args: tuple, kwargs: dict) -> tuple:
+        if name.startswith("_") or not callable(getattr(game_state, name, None)):
+            return (MSG_ERROR, AttributeError(f"GameState has no method {name}"))
+        try:
+            return (MSG_RESULT, getattr(game_state, name)(*args, **kwargs))
+        except Exception as e:
+            return (MSG_ERROR, _picklable(e))
@@ -0,0 +1,158 @@
+"""
+This file is responsible for running many games between a set of bots
+on a pool of worker processes
+"""
+from src.game import Game, suppress_stdout
+from src.game_constants import Team
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import json
+import math
+import os
+import time
+
+
+@dataclass
+class Match:
+    game_name: str
+    map_name: str
+    red_bot: str
+    blue_bot: str
+    round_number: int
+    cost: int
+
+
+def map_cost(map_name: str) -> int:
+    """
+    Expected length of a game on a map, used to schedule long games first
+    """
+    with open(f"maps/{map_name}.awap23m") as f:
+        tiles = json.load(f)
+    return sum(1 for row in tiles for tile in row if tile[0] != "I")
+
+
+def play_match(match: Match, save_replays: bool, isolate_bots: bool, clock: str) -> dict:
+    """
+    Runs one game inside a worker, reusing parsed maps and imported bots
+    """
+    result = match.__dict__.copy()
+    start = time.time()
+    try:
+        game = Game(match.game_name, f"bots/{match.red_bot}.py", f"bots/{match.blue_bot}.py",
+            f"maps/{match.map_name}.awap23m", reuse_setup=True, isolate_bots=isolate_bots,
+            clock=clock, headless=not save_replays)
+        # Silenced once for the whole game, not every turn
+        with suppress_stdout():
+            game.run_game()
+        result.update({
+            "winner": game.winner.name.lower(),
+            "red_terra_tiles": game.get_tile_count(Team.RED),
+            "blue_terra_tiles": game.get_tile_count(Team.BLUE),
+            "red_robots": len(game.red_robots),
+            "blue_robots": len(game.blue_robots),
+            "red_metal": game.info.get("red_metal"),
+            "blue_metal": game.info.get("blue_metal"),
+            "red_time": game.info.get("red_time"),
+            "blue_time": game.info.get("blue_time"),
+            "error": None,
+        })
+    except Exception as e:
+        result.update({"winner": None, "error": f"{type(e).__name__}: {e}"})
+    result["duration"] = time.time() - start
+    return result
+
+
+class Tournament:
+    def __init__(self, bots: list[str], maps: list[str], output: str, processes: int = None,
+                 save_replays: bool = False, isolate_bots: bool = True, clock: str = "wall"):
+        """
+        Initializes a tournament
+
+        Args:
+            bots (list[str]): bot names located in the bots folder
+            maps (list[str]): map names located in the maps folder
+            output (str): path of the aggregate results file, one JSON object per game
+            processes (int): worker count, defaults to the number of cores
+            save_replays (bool): write a replay file for every game
+            isolate_bots (bool): run each bot in its own process, killed if it runs out of time.
+                Bots run as threads otherwise, and a runaway thread lives on in its pool worker
+            clock (str): charge bots "wall" clock time or their own "cpu" time
+        """
+        if len(bots) < 2:
+            raise ValueError("A tournament needs at least two bots")
+        if len(maps) == 0:
+            raise ValueError("A tournament needs at least one map")
+
+        self.bots = bots
+        self.maps = maps
+        self.output = output
+        self.processes = processes or os.cpu_count()
+        self.save_replays = save_replays
+        self.isolate_bots = isolate_bots
+        self.clock = clock
+        self.map_costs = {map_name: map_cost(map_name) for map_name in maps}
+        self.scores = {bot: 0 for bot in bots}
+        self.opponents = {bot: set() for bot in bots}
+        self.results = []
+
+    def pairing_matches(self, bot_a: str, bot_b: str, round_number: int) -> list[Match]:
+        # Each pairing plays every map from both sides
+        matches = []
+        for map_name in self.maps:
+            for red, blue in ((bot_a, bot_b), (bot_b, bot_a)):
+                matches.append(Match(f"{blue}-{red}-{map_name}-r{round_number}", map_name,
+                    red, blue, round_number, self.map_costs[map_name]))
+        return matches
+
+    def swiss_pairings(self) -> list[tuple[str, str]]:
+        # Pair bots of similar score, avoiding rematches where possible
+        standing = sorted(self.bots, key=lambda bot: -self.scores[bot])
+        pairings = []
+        while len(standing) > 1:
+            bot = standing.pop(0)
+            opponent = next((other for other in standing if other not in self.opponents[bot]), standing[0])
+            standing.remove(opponent)
+            pairings.append((bot, opponent))
+        # Odd bot out gets a bye worth a win on every game of a pairing
+        if standing:
+            self.scores[standing[0]] += 2 * len(self.maps)
+        return pairings
+
+    def run_round_robin(self) -> dict[str, int]:
+        matches = []
+        for bot_a, bot_b in itertools.combinations(self.bots, 2):
+            matches.extend(self.pairing_matches(bot_a, bot_b, 1))
+        with ProcessPoolExecutor(self.processes) as pool, open(self.output, "w") as outfile:
+            self.run_matches(pool, matches, outfile)
+        return self.scores
+
+    def run_swiss(self, rounds: int = None) -> dict[str, int]:
+        if rounds is None:
+            rounds = math.ceil(math.log2(len(self.bots)))
+        with ProcessPoolExecutor(self.processes) as pool, open(self.output, "w") as outfile:
+            for round_number in range(1, rounds + 1):
+                matches = []
+                for bot_a, bot_b in self.swiss_pairings():
+                    self.opponents[bot_a].add(bot_b)
+                    self.opponents[bot_b].add(bot_a)
+                    matches.extend(self.pairing_matches(bot_a, bot_b, round_number))
+                self.run_matches(pool, matches, outfile)
+        return self.scores
+
+    def run_matches(self, pool: ProcessPoolExecutor, matches: list[Match], outfile) -> None:
+        # Longest expected games first so the pool drains evenly
+        matches = sorted(matches, key=lambda match: -match.cost)
+        futures = [pool.submit(play_match, match, self.save_replays, self.isolate_bots, self.clock) for match in matches]
+        for future in as_completed(futures):
+            self.record(future.result(), outfile)
+
+    def record(self, result: dict, outfile) -> None:
+        # Stream result to the aggregate file
+        self.results.append(result)
+        outfile.write(json.dumps(result) + "\n")
+        outfile.flush()
+        if result["winner"] == "red":
+            self.scores[result["red_bot"]] += 1
+        elif result["winner"] == "blue":
+            self.scores[result["blue_bot"]] += 1
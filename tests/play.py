@@ -0,0 +1,112 @@
+"""
+Random play through the public GameState API, shared by the tests
+"""
+import os
+import pathlib
+import random
+from src.batch_env import BatchGame
+from src.game_constants import Direction, RobotType, Team
+
+MAPS_DIR = pathlib.Path(__file__).resolve().parents[1] / "maps"
+EXAMPLE_BOT = str(MAPS_DIR.parent / "bots" / "example_bot.py")
+
+ROBOT_TYPES = (RobotType.EXPLORER, RobotType.MINER, RobotType.TERRAFORMER)
+
+# Bots written by tests, play_turn runs the given body
+BOT_TEMPLATE = """import os, time
+class BotPlayer:
+    def __init__(self, team):
+        self.team = team
+    def play_turn(self, game_state):
+        {body}
+"""
+
+
+def new_game(map_name: str) -> BatchGame:
+    game = BatchGame(str(MAPS_DIR / f"{map_name}.awap23m"))
+    game.begin_turn(Team.BLUE, 1)
+    return game
+
+
+def played_game(map_name: str, turns: int, seed: int = 0) -> BatchGame:
+    # A game some turns in, with robots on both sides
+    game = new_game(map_name)
+    rng = random.Random(seed)
+    for _ in range(turns):
+        play_turn(game.game_state, rng)
+        next_turn(game)
+    return game
+
+
+def next_turn(game: BatchGame) -> None:
+    # Blue plays first each turn, like the engine
+    if game.info.get("team") == Team.BLUE:
+        game.begin_turn(Team.RED, game.info.get("turn"))
+    else:
+        game.begin_turn(Team.BLUE, game.info.get("turn") + 1)
+
+
+def random_orders(game_state, rng: random.Random) -> list:
+    """
+    Orders in submit_actions form for every robot of the current team, some
+    of them illegal
+    """
+    orders = []
+    for name in game_state.get_ally_robots():
+        if rng.random() < 0.05:
+            orders.append((name, None, False, rng.choice(ROBOT_TYPES)))
+        else:
+            orders.append((name, rng.choice(list(Direction)), rng.random() < 0.7))
+    return orders
+
+
+def random_spawns(game_state, rng: random.Random) -> list:
+    tiles = game_state.get_empty_ally_terraformed_tiles()
+    return [(rng.choice(ROBOT_TYPES), row, col) for row, col in rng.sample(tiles, min(2, len(tiles)))]
+
+
+def apply_order(game_state, order: tuple) -> None:
+    # One order as single calls, stopping at its first illegal step like submit_actions
+    name, move, action, transform = (*order, *(None, None, False, None)[len(order):])
+    if move is not None:
+        if not game_state.can_move_robot(name, move):
+            return
+        game_state.move_robot(name, move)
+        if name not in game_state.get_ally_robots():
+            return
+    if action:
+        if not game_state.can_robot_action(name):
+            return
+        game_state.robot_action(name)
+    if transform is not None and game_state.can_transform_robot(name, transform):
+        game_state.transform_robot(name, transform)
+
+
+def play_turn(game_state, rng: random.Random) -> None:
+    for order in random_orders(game_state, rng):
+        apply_order(game_state, order)
+    for robotType, row, col in random_spawns(game_state, rng):
+        if game_state.can_spawn_robot(robotType, row, col):
+            game_state.spawn_robot(robotType, row, col)
+
+
+def snapshot(game_state) -> tuple:
+    """
+    Everything the current team can see, for comparing game states
+    """
+    return (
+        game_state.get_team(),
+        game_state.get_turn(),
+        game_state.get_metal(),
+        game_state.get_map(),
+        game_state.get_ally_robots(),
+        game_state.get_enemy_robots(),
+        game_state.get_fog_bitboard(),
+    )
+
+
+def write_bot(folder: str, name: str, body: str = "pass") -> str:
+    path = os.path.join(folder, f"{name}.py")
+    with open(path, "w") as outfile:
+        outfile.write(BOT_TEMPLATE.format(body=body))
+    return path
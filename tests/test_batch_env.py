@@ -0,0 +1,38 @@
+import unittest
+from src.batch_env import BatchEnv, NUM_ACTIONS
+from src.observation import np
+from tests.play import MAPS_DIR
+
+
+@unittest.skipIf(np is None, "BatchEnv requires numpy")
+class BatchEnvTest(unittest.TestCase):
+    def test_out_of_range_codes(self):
+        env = BatchEnv(str(MAPS_DIR / "owl.awap23m"), num_envs=2)
+        obs = env.reset()
+        for code in (NUM_ACTIONS, -1):
+            actions = np.zeros((2,) + obs.shape[2:], dtype=np.int64)
+            actions[1, 3, 4] = code
+            with self.assertRaises(ValueError):
+                env.step(actions)
+        # Nothing was stepped
+        self.assertEqual(env.turn, 1)
+        env.step(np.full((2,) + obs.shape[2:], NUM_ACTIONS - 1))
+
+    def test_action_shapes(self):
+        env = BatchEnv(str(MAPS_DIR / "owl.awap23m"), num_envs=2)
+        _, height, width = env.reset().shape[1:]
+        for shape in ((1, height, width), (2, height, width + 1), (2, height * width - 1), (2, height, width, 1),
+                (2 * height * width,), (2, 1, height * width)):
+            with self.subTest(shape=shape), self.assertRaises(ValueError):
+                env.step(np.zeros(shape, dtype=np.int64))
+        self.assertEqual(env.turn, 1)
+        self.assertEqual(env.team.name, "BLUE")
+
+        # Flat per-game actions step like the grid
+        env.step(np.zeros((2, height * width), dtype=np.int64))
+        env.step(np.zeros((2, height, width), dtype=np.int64))
+        self.assertEqual(env.turn, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+from tests.play import new_game, next_turn, play_turn
+
+
+def positions(robots: dict) -> dict:
+    return {name: (robot.row, robot.col) for name, robot in robots.items()}
+
+
+class ChangeFeedTest(unittest.TestCase):
+    def play_and_check(self, map_name: str, seed: int, turns: int) -> dict:
+        """
+        Plays random turns, checking every team's feed against a full rescan.
+        Returns how often each kind of enemy change came up
+        """
+        rng = random.Random(seed)
+        game = new_game(map_name)
+        game_state = game.game_state
+        last = {}
+        counts = {"died": 0, "hidden": 0, "revealed": 0}
+        for _ in range(2 * turns):
+            team = game_state.get_team()
+            changes = game_state.get_changes_since_last_turn()
+            ally, enemy, metal = game_state.get_ally_robots(), game_state.get_enemy_robots(), game_state.get_metal()
+            self.assertIsNotNone(changes)
+
+            if team in last:
+                lastAlly, lastEnemy, lastMetal = last[team]
+                self.assertEqual(changes.metal, metal - lastMetal)
+
+                # Ally robots are always in view
+                teamOf = lambda robots: {name for name, robot in robots.items() if robot.team == team}
+                self.assertEqual(teamOf(changes.appeared), set(ally) - set(lastAlly))
+                self.assertEqual(teamOf(changes.died), set(lastAlly) - set(ally))
+                self.assertEqual(teamOf(changes.moved), {name for name in set(ally) & set(lastAlly)
+                    if (ally[name].row, ally[name].col) != (lastAlly[name].row, lastAlly[name].col)})
+
+                # Enemy robots seen last turn, updated by the feed, are the ones in view now
+                tracked = positions(lastEnemy)
+                for name in list(changes.died) + list(changes.hidden):
+                    tracked.pop(name, None)
+                for robots in (changes.appeared, changes.moved, changes.revealed):
+                    tracked.update({name: coord for name, coord in positions(robots).items()
+                        if robots[name].team != team})
+                self.assertEqual(tracked, positions(enemy))
+                counts["died"] += len(set(changes.died) - set(lastAlly))
+                counts["hidden"] += len(changes.hidden)
+                counts["revealed"] += len(changes.revealed)
+
+            last[team] = (ally, enemy, metal)
+            play_turn(game_state, rng)
+            next_turn(game)
+        return counts
+
+    def test_matches_rescan(self):
+        counts = {}
+        # Random robots only meet on the small map, where every kind of change comes up
+        for seed in range(3):
+            for kind, count in self.play_and_check("competition", seed, 200).items():
+                counts[kind] = counts.get(kind, 0) + count
+        # Every kind of enemy change was checked at least once
+        self.assertTrue(all(counts.values()), counts)
+
+    def test_first_turn(self):
+        # Both teams get a feed on their first turn, covering the game so far
+        game = new_game("owl")
+        self.assertEqual(game.game_state.get_changes_since_last_turn().metal, 0)
+        next_turn(game)
+        self.assertIsNotNone(game.game_state.get_changes_since_last_turn())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import tempfile
+import unittest
+from src.game import Game
+from src.game_constants import GameConstants
+from tests.play import MAPS_DIR, EXAMPLE_BOT, write_bot
+
+
+def play_red(body: str, turns: int, clock: str, isolate_bots: bool = False, wall_budget: float = None,
+        red_time: float = None) -> list:
+    # Red's turns in a replay of the given bot against the example bot
+    with tempfile.TemporaryDirectory() as folder:
+        game = Game("test", write_bot(folder, "red_bot", body), EXAMPLE_BOT, str(MAPS_DIR / "x.awap23m"),
+            print_reply=True, isolate_bots=isolate_bots, clock=clock)
+        game.max_turns = turns
+        if wall_budget is not None:
+            game.wall_budget = wall_budget
+        if red_time is not None:
+            game.info.update({"red_time": red_time})
+        replay = json.loads(game.run_game())
+    return [turn for turn in replay['turns'] if turn['team'] == "red"]
+
+
+class ClockTest(unittest.TestCase):
+    def test_wall_clock_charges_sleep(self):
+        turns = play_red("time.sleep(0.1)", 3, "wall")
+        self.assertEqual(len(turns), 3)
+        for turn in turns:
+            self.assertGreaterEqual(turn['wall_time'], 0.1)
+        self.assertLessEqual(turns[-1]['time_left'], GameConstants.TIME_LIMIT - 0.3)
+
+    def test_cpu_clock_does_not_charge_sleep(self):
+        for isolate_bots in (False, True):
+            with self.subTest(isolate_bots=isolate_bots):
+                turns = play_red("time.sleep(0.1)", 3, "cpu", isolate_bots)
+                self.assertEqual(len(turns), 3)
+                self.assertGreater(turns[-1]['time_left'], GameConstants.TIME_LIMIT - 0.1)
+
+    def test_cpu_clock_wall_cap(self):
+        # A turn sleeping past CPU_CLOCK_WALL_FACTOR times the time left is a timeout
+        for isolate_bots in (False, True):
+            with self.subTest(isolate_bots=isolate_bots):
+                turns = play_red("time.sleep(1)", 5, "cpu", isolate_bots, red_time=0.05)
+                self.assertEqual(len(turns), 1)
+                self.assertEqual(turns[0]['time_left'], -1)
+                self.assertLess(turns[0]['wall_time'], 0.5)
+
+    def test_cpu_clock_wall_budget(self):
+        # Short sleeps that add up over the game run out the wall budget
+        for isolate_bots in (False, True):
+            with self.subTest(isolate_bots=isolate_bots):
+                turns = play_red("time.sleep(0.1)", 20, "cpu", isolate_bots, wall_budget=0.35)
+                self.assertTrue(2 <= len(turns) <= 4)
+                self.assertEqual(turns[-1]['time_left'], -1)
+                for turn in turns[:-1]:
+                    self.assertGreater(turn['time_left'], GameConstants.TIME_LIMIT - 0.1)
+
+    def test_crash_never_gains_time(self):
+        # Crashed workers report no cpu time, charged as their wall time and never negative
+        for isolate_bots in (False, True):
+            with self.subTest(isolate_bots=isolate_bots):
+                turns = play_red("raise RuntimeError('crash')", 5, "cpu", isolate_bots)
+                self.assertEqual(len(turns), 5)
+                times = [turn['time_left'] for turn in turns]
+                self.assertLessEqual(times[0], GameConstants.TIME_LIMIT)
+                self.assertEqual(times, sorted(times, reverse=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+from collections import deque
+from unittest import mock
+from src import distance_table
+from src.distance_table import DistanceTable, UNREACHABLE
+from src.game_constants import Direction
+from src.map import Map
+from tests.play import MAPS_DIR
+
+
+def reference_distances(height: int, width: int, impassable: list, start: int) -> list:
+    # Plain BFS over the grid, -1 where there is no path
+    distances = [-1] * (height * width)
+    if impassable[start]:
+        return distances
+    distances[start] = 0
+    queue = deque([start])
+    while queue:
+        row, col = divmod(queue.popleft(), width)
+        for direction in Direction:
+            newRow, newCol = row + direction.value[0], col + direction.value[1]
+            newIndex = newRow * width + newCol
+            if 0 <= newRow < height and 0 <= newCol < width and not impassable[newIndex] and distances[newIndex] == -1:
+                distances[newIndex] = distances[row * width + col] + 1
+                queue.append(newIndex)
+    return distances
+
+
+class DistanceTableTest(unittest.TestCase):
+    def setUp(self):
+        self.map = Map(str(MAPS_DIR / "competition.awap23m"))
+        self.height, self.width = self.map.get_height(), self.map.get_width()
+
+    def new_table(self, key: str = None) -> DistanceTable:
+        return DistanceTable(self.height, self.width, self.map.get_impassable(), self.map.get_neighbors(), key)
+
+    def test_matches_bfs(self):
+        table = self.new_table()
+        impassable = self.map.get_impassable()
+        expected = [reference_distances(self.height, self.width, impassable, start)
+            for start in range(self.height * self.width)]
+        ends = range(0, self.height * self.width, 7)
+        for start in range(self.height * self.width):
+            self.assertEqual([table.distance(start, end) for end in ends], [expected[start][end] for end in ends])
+
+        # Narrowed once every row is known, with the same answers
+        table.compute_all()
+        self.assertTrue(table.is_complete())
+        self.assertEqual(table.distances_from(0).typecode, "B")
+        for start in range(self.height * self.width):
+            self.assertEqual([table.distance(start, end) for end in ends], [expected[start][end] for end in ends])
+
+    def test_cache_roundtrip(self):
+        with tempfile.TemporaryDirectory() as folder, mock.patch.object(distance_table, "DISTANCE_CACHE_DIR", folder):
+            table = self.new_table("test")
+            table.compute_all()
+            cached = self.new_table("test")
+            self.assertTrue(cached.is_complete())
+            for index in range(self.height * self.width):
+                self.assertEqual(cached.distances_from(index), table.distances_from(index))
+
+            # A cache for another map size is ignored
+            other = DistanceTable(self.height + 1, self.width, [False] * ((self.height + 1) * self.width),
+                [[] for _ in range((self.height + 1) * self.width)], "test")
+            self.assertFalse(other.is_complete())
+            self.assertEqual(other.distance(0, 1), -1)
+            self.assertEqual(other.distances_from(0)[1], UNREACHABLE["H"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import random
+import unittest
+from src.errors import ForkError, SpeculationError
+from src.robot import Robot
+from tests.play import played_game, next_turn, play_turn, snapshot
+
+
+class ForkTest(unittest.TestCase):
+    def setUp(self):
+        self.game = played_game("competition", 30)
+
+    def test_fork_plays_like_the_game(self):
+        # Same calls on a fork (ending turns with end_turn) and on the game
+        game_state = self.game.game_state
+        child = game_state.fork()
+        childRng, gameRng = random.Random(1), random.Random(1)
+        for _ in range(40):
+            play_turn(child, childRng)
+            child.end_turn()
+            play_turn(game_state, gameRng)
+            next_turn(self.game)
+            self.assertEqual(snapshot(child), snapshot(game_state))
+            self.assertEqual(child.get_changes_since_last_turn(), game_state.get_changes_since_last_turn())
+
+    def test_fork_is_independent(self):
+        game_state = self.game.game_state
+        before, counter = snapshot(game_state), Robot.counter
+        child = game_state.fork()
+        rng = random.Random(2)
+        for _ in range(20):
+            play_turn(child, rng)
+            child.end_turn()
+        self.assertEqual(snapshot(game_state), before)
+        self.assertEqual(Robot.counter, counter)
+
+        # Nor does the game change the fork, or a fork of the fork
+        childBefore = snapshot(child)
+        grandchild = child.fork()
+        play_turn(game_state, rng)
+        play_turn(grandchild, rng)
+        self.assertEqual(snapshot(child), childBefore)
+
+    def test_misuse(self):
+        game_state = self.game.game_state
+        with self.assertRaises(ForkError):
+            game_state.end_turn()
+        child = game_state.fork()
+        child.begin_speculation()
+        with self.assertRaises(SpeculationError):
+            child.fork()
+        with self.assertRaises(SpeculationError):
+            child.end_turn()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import pickle
+import unittest
+from src.game_constants import RobotType
+from tests.play import new_game
+
+
+class GameInfoTest(unittest.TestCase):
+    def setUp(self):
+        self.game_state = new_game("owl").game_state
+
+    def spawn(self) -> str:
+        row, col = self.game_state.get_empty_ally_terraformed_tiles()[0]
+        return self.game_state.spawn_robot(RobotType.EXPLORER, row, col).name
+
+    def test_lazy(self):
+        info = self.game_state.get_info()
+        self.assertEqual(info.turn, 1)
+        self.assertNotIn("map", info.__dict__)
+        self.assertEqual(info.map, self.game_state.get_map())
+        # The same object until the game state changes
+        self.assertIs(self.game_state.get_info(), info)
+
+    def test_snapshot(self):
+        # Fields read before the action, and fields read only after it
+        info = self.game_state.get_info()
+        metal, robots = info.metal, info.ally_robots
+        name = self.spawn()
+        self.assertEqual((info.metal, info.ally_robots), (metal, robots))
+        self.assertEqual(sum(tile.robot is not None for row in info.map for tile in row if tile is not None), 0)
+
+        current = self.game_state.get_info()
+        self.assertIsNot(current, info)
+        self.assertEqual(current.metal, self.game_state.get_metal())
+        self.assertLess(current.metal, metal)
+        self.assertIn(name, current.ally_robots)
+
+    def test_rollback(self):
+        before = self.game_state.get_info()
+        self.game_state.begin_speculation()
+        name = self.spawn()
+        during = self.game_state.get_info()
+        self.game_state.rollback()
+        after = self.game_state.get_info()
+        self.assertIn(name, during.ally_robots)
+        self.assertEqual((after.metal, after.ally_robots), (before.metal, before.ally_robots))
+        self.assertEqual(after.map, before.map)
+
+    def test_pickle(self):
+        # Sent to isolated bots with every field filled in
+        info = pickle.loads(pickle.dumps(self.game_state.get_info()))
+        self.assertEqual(info.map, self.game_state.get_map())
+        self.assertEqual(info.team, self.game_state.get_team())
+
+
+if __name__ == "__main__":
+    unittest.main()
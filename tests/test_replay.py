@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+from src.game import Game
+from src.replay import ReplayReader, encode_binary, decode_binary, BINARY_EXTENSION
+from tests.play import MAPS_DIR, EXAMPLE_BOT
+
+
+def play_replay(map_name: str, turns: int, red_time: float = None) -> dict:
+    # Replay of example bots, red times out on its first turn when given no time
+    game = Game("test", EXAMPLE_BOT, EXAMPLE_BOT, str(MAPS_DIR / f"{map_name}.awap23m"), print_reply=True)
+    game.max_turns = turns
+    if red_time is not None:
+        game.info.update({"red_time": red_time})
+    return json.loads(game.run_game())
+
+
+class BinaryReplayTest(unittest.TestCase):
+    def assertRoundtrip(self, replay: dict) -> None:
+        # Exact, including ints staying ints
+        for codec in ("zlib", "lzma"):
+            decoded = decode_binary(encode_binary(replay, codec))
+            self.assertEqual(json.dumps(decoded, sort_keys=True), json.dumps(replay, sort_keys=True))
+
+    def test_roundtrip(self):
+        self.assertRoundtrip(play_replay("owl", 40))
+
+    def test_roundtrip_timeout(self):
+        replay = play_replay("x", 5, red_time=0)
+        timeout = replay['turns'][-1]
+        self.assertEqual((timeout['team'], timeout['time_left'], timeout['metal']), ("red", -1, -1))
+        self.assertRoundtrip(replay)
+
+    def test_roundtrip_without_times(self):
+        # Replays from before wall and cpu time were recorded
+        replay = play_replay("x", 10)
+        for turn in replay['turns']:
+            del turn['wall_time'], turn['cpu_time']
+        self.assertRoundtrip(replay)
+
+
+class BinaryFlagsTest(unittest.TestCase):
+    def test_incompatible_flags(self):
+        mapPath = str(MAPS_DIR / "x.awap23m")
+        for flags in ({"print_reply": True}, {"stream_replay": True}, {"headless": True}):
+            with self.subTest(**flags), self.assertRaises(ValueError):
+                Game("test", EXAMPLE_BOT, EXAMPLE_BOT, mapPath, binary_replay=True, **flags)
+
+
+class ReplayReaderTest(unittest.TestCase):
+    def test_formats_agree(self):
+        replay = play_replay("owl", 60)
+        with tempfile.TemporaryDirectory() as folder:
+            jsonPath = os.path.join(folder, "game.awap23r")
+            binaryPath = os.path.join(folder, f"game.{BINARY_EXTENSION}")
+            with open(jsonPath, "w") as outfile:
+                json.dump(replay, outfile)
+            with open(binaryPath, "wb") as outfile:
+                outfile.write(encode_binary(replay))
+            readers = [ReplayReader(jsonPath, keyframe_interval=7), ReplayReader(binaryPath, keyframe_interval=7)]
+            for index in range(0, len(replay['turns']), 5):
+                self.assertEqual(readers[0].state_at(index), readers[1].state_at(index))
+
+            # Keyframes read back from the cache give the same boards
+            cached = ReplayReader(jsonPath, keyframe_interval=7)
+            self.assertEqual(cached.state_at(len(replay['turns']) - 1), readers[0].state_at(len(replay['turns']) - 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
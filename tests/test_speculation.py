@@ -0,0 +1,65 @@
+import random
+import unittest
+from src.errors import SpeculationError
+from src.robot import Robot
+from tests.play import played_game, next_turn, play_turn, snapshot
+
+
+class SpeculationTest(unittest.TestCase):
+    def setUp(self):
+        self.game = played_game("competition", 30)
+
+    def test_rollback_restores(self):
+        # Speculating on the game itself, then playing on, matches a fork that never speculated
+        game_state = self.game.game_state
+        child = game_state.fork()
+        before, counter = snapshot(game_state), Robot.counter
+        rng = random.Random(1)
+        for _ in range(20):
+            game_state.begin_speculation()
+            play_turn(game_state, rng)
+            game_state.begin_speculation()
+            play_turn(game_state, rng)
+            game_state.rollback()
+            game_state.rollback()
+            self.assertFalse(game_state.is_speculating())
+            self.assertEqual(snapshot(game_state), before)
+            self.assertEqual(Robot.counter, counter)
+
+        gameRng, childRng = random.Random(2), random.Random(2)
+        for _ in range(20):
+            play_turn(game_state, gameRng)
+            next_turn(self.game)
+            play_turn(child, childRng)
+            child.end_turn()
+            self.assertEqual(snapshot(game_state), snapshot(child))
+            self.assertEqual(game_state.get_changes_since_last_turn(), child.get_changes_since_last_turn())
+
+    def test_commit_keeps(self):
+        # Committed calls stay, and an outer rollback still undoes them
+        game_state = self.game.game_state
+        child = game_state.fork()
+        before = snapshot(game_state)
+        game_state.begin_speculation()
+        play_turn(game_state, random.Random(3))
+        game_state.begin_speculation()
+        play_turn(game_state, random.Random(4))
+        game_state.commit()
+        played = snapshot(game_state)
+        game_state.rollback()
+        self.assertEqual(snapshot(game_state), before)
+
+        play_turn(child, random.Random(3))
+        play_turn(child, random.Random(4))
+        self.assertEqual(snapshot(child), played)
+
+    def test_unbalanced(self):
+        game_state = self.game.game_state
+        with self.assertRaises(SpeculationError):
+            game_state.rollback()
+        with self.assertRaises(SpeculationError):
+            game_state.commit()
+
+
+if __name__ == "__main__":
+    unittest.main()
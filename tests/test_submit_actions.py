@@ -0,0 +1,58 @@
+import random
+import unittest
+from src.game_constants import Direction, RobotType
+from tests.play import new_game, played_game, random_orders, random_spawns, apply_order, snapshot
+
+
+class SubmitActionsTest(unittest.TestCase):
+    def setUp(self):
+        self.game = played_game("competition", 20)
+
+    def test_matches_single_calls(self):
+        # Two forks given the same orders, in one call and as single calls
+        batched, single = self.game.game_state.fork(), self.game.game_state.fork()
+        rng = random.Random(1)
+        checked = 0
+        for _ in range(60):
+            orders = random_orders(batched, rng)
+            results = batched.submit_actions(orders)
+            for order in orders:
+                apply_order(single, order)
+            self.assertEqual(snapshot(batched), snapshot(single))
+
+            # Each result describes its robot after its order (later collisions aside)
+            ally = single.get_ally_robots()
+            for result in results:
+                if result.robot is not None and result.name in ally:
+                    self.assertEqual(result.robot, ally[result.name])
+                    checked += 1
+
+            for robotType, row, col in random_spawns(batched, rng):
+                for game_state in (batched, single):
+                    if game_state.can_spawn_robot(robotType, row, col):
+                        game_state.spawn_robot(robotType, row, col)
+            batched.end_turn()
+            single.end_turn()
+        self.assertGreater(checked, 0)
+
+    def test_results(self):
+        # A robot spawned on turn one, with metal left to transform it
+        game_state = new_game("owl").game_state
+        row, col = game_state.get_empty_ally_terraformed_tiles()[0]
+        name = game_state.spawn_robot(RobotType.EXPLORER, row, col).name
+        results = game_state.submit_actions([
+            ("robot_unknown", Direction.UP),
+            (game_state.get_ally_robots()[name], None, False, RobotType.MINER),
+            (name, Direction.UP, True),
+        ])
+        self.assertIsNotNone(results[0].error)
+        self.assertFalse(results[0].moved)
+        self.assertTrue(results[1].transformed and results[1].error is None)
+        self.assertEqual(results[1].robot.type, RobotType.MINER)
+        self.assertNotIn(name, game_state.get_ally_robots())
+        # The robot was transformed away, so the last order fails at its first step
+        self.assertIsNotNone(results[2].error)
+
+
+if __name__ == "__main__":
+    unittest.main()
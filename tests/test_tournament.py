@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from src.tournament import Tournament
+from tests.play import MAPS_DIR
+
+
+class TournamentTest(unittest.TestCase):
+    def setUp(self):
+        # Maps are read relative to the repository root
+        cwd = os.getcwd()
+        os.chdir(MAPS_DIR.parent)
+        self.addCleanup(os.chdir, cwd)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.output = os.path.join(folder.name, "results.jsonl")
+
+    def new_tournament(self, bots: list) -> Tournament:
+        return Tournament(bots, ["owl", "x"], self.output, processes=1)
+
+    def scheduled(self, tournament: Tournament, run, *args) -> list:
+        # Matches handed to the pool, without playing them
+        matches = []
+        with mock.patch.object(Tournament, "run_matches", lambda self, pool, batch, outfile: matches.append(batch)):
+            run(*args)
+        return matches
+
+    def test_isolates_bots_by_default(self):
+        self.assertTrue(self.new_tournament(["a", "b"]).isolate_bots)
+
+    def test_pairing_matches(self):
+        matches = self.new_tournament(["a", "b"]).pairing_matches("a", "b", 3)
+        self.assertEqual(sorted((match.map_name, match.red_bot, match.blue_bot) for match in matches),
+            [("owl", "a", "b"), ("owl", "b", "a"), ("x", "a", "b"), ("x", "b", "a")])
+        self.assertEqual(len({match.game_name for match in matches}), 4)
+        self.assertTrue(all(match.round_number == 3 for match in matches))
+
+    def test_round_robin(self):
+        tournament = self.new_tournament(["a", "b", "c"])
+        (matches,) = self.scheduled(tournament, tournament.run_round_robin)
+        pairings = {frozenset((match.red_bot, match.blue_bot)) for match in matches}
+        self.assertEqual(pairings, {frozenset("ab"), frozenset("ac"), frozenset("bc")})
+        self.assertEqual(len(matches), 3 * 2 * 2)
+
+    def test_swiss_bye(self):
+        tournament = self.new_tournament(["a", "b", "c"])
+        tournament.scores.update({"a": 3, "b": 2, "c": 1})
+        self.assertEqual(tournament.swiss_pairings(), [("a", "b")])
+        # The bot left over is scored a win on every game of a pairing
+        self.assertEqual(tournament.scores, {"a": 3, "b": 2, "c": 1 + 2 * 2})
+
+    def test_swiss_avoids_rematches(self):
+        tournament = self.new_tournament(["a", "b", "c", "d"])
+        rounds = self.scheduled(tournament, tournament.run_swiss, 3)
+        self.assertEqual(len(rounds), 3)
+        played = [frozenset((match.red_bot, match.blue_bot)) for matches in rounds for match in matches]
+        # Four bots have exactly three rounds of new opponents
+        self.assertEqual(len(set(played)), 6)
+
+    def test_record(self):
+        tournament = self.new_tournament(["a", "b"])
+        with open(self.output, "w") as outfile:
+            tournament.record({"red_bot": "a", "blue_bot": "b", "winner": "red"}, outfile)
+            tournament.record({"red_bot": "a", "blue_bot": "b", "winner": "blue"}, outfile)
+            tournament.record({"red_bot": "b", "blue_bot": "a", "winner": None}, outfile)
+        self.assertEqual(tournament.scores, {"a": 1, "b": 1})
+        with open(self.output) as infile:
+            self.assertEqual(len(infile.readlines()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()